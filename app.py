@@ -1,86 +1,258 @@
 
-from flask import Flask, request, render_template, redirect, url_for, g, send_file, jsonify, make_response
+from flask import Flask, request, render_template, redirect, url_for, g, send_file, jsonify, make_response, Response, stream_with_context
 from flask_socketio import SocketIO
-import sqlite3, datetime, qrcode, io, uuid, os, hashlib
+import sqlite3, datetime, io, uuid, os, hashlib, zlib, csv, json, time, threading
+import click
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+import compress, expiry, hll, metrics, ratelimit, sqltrace, tally
+
+try:
+    import msgpack  # optional: enables application/msgpack results
+except ImportError:
+    msgpack = None
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key')
 
 # Production configuration
-if os.environ.get('FLASK_ENV') == 'production':
+if os.environ.get('SOCKETIO_ASYNC_MODE'):
+    # e.g. 'threading' when served by app_asgi.py or an in-process benchmark
+    socketio = SocketIO(app, cors_allowed_origins="*", async_mode=os.environ['SOCKETIO_ASYNC_MODE'])
+elif os.environ.get('FLASK_ENV') == 'production':
     socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet')
 else:
     socketio = SocketIO(app, cors_allowed_origins="*")
 
-DB = "poll.db"
+DB = os.environ.get('POLL_DB', 'poll.db')
+# With VOTE_SHARDS=N, votes (and their tally checkpoints) live in N extra
+# SQLite files next to DB, chosen by a hash of poll_id, so a hot poll only
+# holds the write lock of its own shard. Polls, options and insights stay in DB.
+# The count is recorded in DB and cannot change once votes are sharded.
+VOTE_SHARDS = int(os.environ.get('VOTE_SHARDS', 0))
+
+metrics.init_app(app)
+sqltrace.init_app(app)
+compress.init_app(app)
+vote_limiter = ratelimit.VoteLimiter.from_env()
+# Called as listener(poll_id, total_votes) after every accepted vote, for live
+# channels other than this module's Socket.IO server (see app_asgi.py).
+vote_listeners = []
+# Called as listener(poll_id, payload) when the expiry scheduler closes a poll,
+# with the same final results dict the poll_closed Socket.IO event carries.
+close_listeners = []
+tally_engine = tally.TallyEngine(int(os.environ.get('TALLY_MAX_POLLS', 10000))) if os.environ.get('TALLY_ENGINE') == '1' else None
+# Open polls wait on a timer wheel and are closed when it fires (see close_poll).
+# EXPIRY_SCHEDULER=0 turns this off and leaves expiry to the per-request check.
+expiry_wheel = expiry.TimerWheel(float(os.environ.get('EXPIRY_TICK_SECONDS', 1))) if os.environ.get('EXPIRY_SCHEDULER') != '0' else None
+# Polls opened by other processes (flask import-polls, other workers) are
+# found by rescanning the open polls this often.
+EXPIRY_RESCAN_SECONDS = float(os.environ.get('EXPIRY_RESCAN_SECONDS', 60))
+EXPIRY_RETRY_SECONDS = 10
+# Final results of closed polls, (results, total) as poll_results() returns them.
+frozen_results = {}
+FROZEN_RESULTS_MAX = 10000
+
 
+# The schema (tables, added columns, indexes, vote shards) is brought up to
+# date once per process, on the first connection, so servers that never call
+# init_db() (gunicorn app:app) still get the columns newer code reads.
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+def open_db():
+    db = metrics.connect(DB)
+    db.row_factory = sqlite3.Row
+    return db
 
 def get_db():
+    global _schema_ready
     db = getattr(g, '_database', None)
     if db is None:
-        db = g._database = sqlite3.connect(DB)
+        db = g._database = open_db()
+        if not _schema_ready:
+            with _schema_lock:
+                if not _schema_ready:
+                    create_schema(db)
+                    _schema_ready = True
+    return db
+
+def shard_for(poll_id):
+    return zlib.crc32(str(poll_id).encode()) % VOTE_SHARDS
+
+def shard_path(shard):
+    root, ext = os.path.splitext(DB)
+    return f"{root}.votes{shard}{ext or '.db'}"
+
+def get_shard_db(shard):
+    if not _schema_ready:
+        get_db()  # creates the shard tables too
+    shards = g.setdefault('_vote_dbs', {})
+    db = shards.get(shard)
+    if db is None:
+        db = shards[shard] = metrics.connect(shard_path(shard))
         db.row_factory = sqlite3.Row
     return db
 
+def get_vote_db(poll_id):
+    """Connection holding poll_id's votes: its shard, or the main DB when unsharded."""
+    if not VOTE_SHARDS:
+        return get_db()
+    return get_shard_db(shard_for(poll_id))
+
+def all_vote_dbs():
+    """Every connection that holds votes, for queries that span polls."""
+    if not VOTE_SHARDS:
+        return [get_db()]
+    return [get_shard_db(shard) for shard in range(VOTE_SHARDS)]
+
 @app.teardown_appcontext
 def close_db(exception):
     db = getattr(g, '_database', None)
     if db is not None:
         db.close()
+    for shard_db in g.pop('_vote_dbs', {}).values():
+        shard_db.close()
+
+VOTES_SCHEMA = '''CREATE TABLE IF NOT EXISTS votes (
+                    id INTEGER PRIMARY KEY,
+                    poll_id INTEGER NOT NULL,
+                    option_id INTEGER NOT NULL,
+                    vote_token TEXT,
+                    device_hash TEXT,
+                    ip TEXT,
+                    created_at TEXT DEFAULT (datetime('now'))
+                )'''
+VOTES_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_votes_poll_created ON votes (poll_id, created_at)",
+    # Ordered by id within a poll, for reading the votes after a tally checkpoint.
+    "CREATE INDEX IF NOT EXISTS idx_votes_poll ON votes (poll_id)",
+)
+
+# Per shard, the last main-database vote id shard-votes copied for each poll.
+MOVED_VOTES_SCHEMA = '''CREATE TABLE IF NOT EXISTS moved_votes (
+                          poll_id INTEGER PRIMARY KEY,
+                          last_vote_id INTEGER NOT NULL
+                      )'''
 
 def init_db():
     with app.app_context():
-        db = get_db()
-        c = db.cursor()
+        get_db()
+
+def create_schema(db, moving_votes=False):
+    """Create or upgrade the tables in db and in every vote shard. Commits.
+
+    Raises RuntimeError if VOTE_SHARDS would hide votes already stored (see
+    check_vote_shards); moving_votes allows shard-votes to start on unsharded votes."""
+    # WAL lets a long read (a streaming vote export) run alongside vote writes
+    # instead of holding them off with "database is locked". The mode is
+    # stored in the file, so it only has to be set once.
+    try:
+        db.execute("PRAGMA journal_mode=WAL")
+    except sqlite3.OperationalError:
+        pass  # Another process holds the database; whoever gets it first sets WAL
+    c = db.cursor()
+    
+    # Create tables with IF NOT EXISTS
+    c.execute('''CREATE TABLE IF NOT EXISTS polls (
+                    id INTEGER PRIMARY KEY,
+                    question TEXT NOT NULL,
+                    expiry TEXT NOT NULL,
+                    hide_results INTEGER DEFAULT 0
+                )''')
+    c.execute('''CREATE TABLE IF NOT EXISTS options (
+                    id INTEGER PRIMARY KEY,
+                    poll_id INTEGER NOT NULL,
+                    text TEXT NOT NULL
+                )''')
+    c.execute(VOTES_SCHEMA)
+    for index in VOTES_INDEXES:
+        c.execute(index)
+    c.execute('''CREATE TABLE IF NOT EXISTS insights (
+                    id INTEGER PRIMARY KEY,
+                    poll_id INTEGER NOT NULL,
+                    insight_text TEXT NOT NULL,
+                    created_at TEXT DEFAULT (datetime('now'))
+                )''')
+    c.execute(tally.SCHEMA)
+    c.execute(hll.SCHEMA)
+    c.execute('''CREATE TABLE IF NOT EXISTS settings (
+                    name TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                )''')
+    check_vote_shards(db, moving_votes)
+    
+    # Add new columns to existing polls table if they don't exist
+    try:
+        c.execute("ALTER TABLE polls ADD COLUMN creator_secret TEXT")
+    except sqlite3.OperationalError:
+        pass  # Column already exists
         
-        # Create tables with IF NOT EXISTS
-        c.execute('''CREATE TABLE IF NOT EXISTS polls (
-                        id INTEGER PRIMARY KEY,
-                        question TEXT NOT NULL,
-                        expiry TEXT NOT NULL,
-                        hide_results INTEGER DEFAULT 0
-                    )''')
-        c.execute('''CREATE TABLE IF NOT EXISTS options (
-                        id INTEGER PRIMARY KEY,
-                        poll_id INTEGER NOT NULL,
-                        text TEXT NOT NULL
-                    )''')
-        c.execute('''CREATE TABLE IF NOT EXISTS votes (
-                        id INTEGER PRIMARY KEY,
-                        poll_id INTEGER NOT NULL,
-                        option_id INTEGER NOT NULL,
-                        vote_token TEXT,
-                        device_hash TEXT,
-                        ip TEXT,
-                        created_at TEXT DEFAULT (datetime('now'))
-                    )''')
-        c.execute('''CREATE TABLE IF NOT EXISTS insights (
-                        id INTEGER PRIMARY KEY,
-                        poll_id INTEGER NOT NULL,
-                        insight_text TEXT NOT NULL,
-                        created_at TEXT DEFAULT (datetime('now'))
-                    )''')
+    try:
+        # SQLite refuses a non-constant DEFAULT when adding a column to a
+        # table that has rows, so add it bare, backfill it, and have inserts
+        # set it themselves.
+        c.execute("ALTER TABLE polls ADD COLUMN created_at TEXT")
+    except sqlite3.OperationalError:
+        pass  # Column already exists
+    c.execute("UPDATE polls SET created_at = datetime('now') WHERE created_at IS NULL")
         
-        # Add new columns to existing polls table if they don't exist
-        try:
-            c.execute("ALTER TABLE polls ADD COLUMN creator_secret TEXT")
-        except sqlite3.OperationalError:
-            pass  # Column already exists
-            
-        try:
-            c.execute("ALTER TABLE polls ADD COLUMN created_at TEXT DEFAULT (datetime('now'))")
-        except sqlite3.OperationalError:
-            pass  # Column already exists
-            
+    try:
+        c.execute("ALTER TABLE polls ADD COLUMN insights_generated INTEGER DEFAULT 0")
+    except sqlite3.OperationalError:
+        pass  # Column already exists
+
+    try:
+        c.execute("ALTER TABLE polls ADD COLUMN closed INTEGER DEFAULT 0")
+    except sqlite3.OperationalError:
+        pass  # Column already exists
+
+    try:
+        c.execute("ALTER TABLE polls ADD COLUMN final_results TEXT")
+    except sqlite3.OperationalError:
+        pass  # Column already exists
+    c.execute("CREATE INDEX IF NOT EXISTS idx_polls_open_expiry ON polls (expiry) WHERE closed = 0")
+
+    try:
+        c.execute("ALTER TABLE polls ADD COLUMN creator_key TEXT")
+    except sqlite3.OperationalError:
+        pass  # Column already exists
+    c.execute("CREATE INDEX IF NOT EXISTS idx_polls_creator ON polls (creator_key, created_at, id) WHERE creator_key IS NOT NULL")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_options_poll ON options (poll_id)")
+    
+    # Update existing polls that don't have creator_secret
+    c.execute("UPDATE polls SET creator_secret = ? WHERE creator_secret IS NULL", (str(uuid.uuid4()),))
+    
+    db.commit()
+
+    for shard in range(VOTE_SHARDS):
+        shard_db = get_shard_db(shard)
         try:
-            c.execute("ALTER TABLE polls ADD COLUMN insights_generated INTEGER DEFAULT 0")
+            shard_db.execute("PRAGMA journal_mode=WAL")
         except sqlite3.OperationalError:
-            pass  # Column already exists
-        
-        # Update existing polls that don't have creator_secret
-        c.execute("UPDATE polls SET creator_secret = ? WHERE creator_secret IS NULL", (str(uuid.uuid4()),))
-        
-        db.commit()
+            pass  # As for the main database: whoever gets the shard first sets WAL
+        shard_db.execute(VOTES_SCHEMA)
+        for index in VOTES_INDEXES:
+            shard_db.execute(index)
+        shard_db.execute(tally.SCHEMA)
+        shard_db.execute(hll.SCHEMA)
+        shard_db.commit()
+
+def check_vote_shards(db, moving_votes=False):
+    """Record VOTE_SHARDS in settings, or raise RuntimeError if it differs from the recorded count.
+
+    Votes are routed by crc32(poll_id) % VOTE_SHARDS, so another count would
+    look for most polls' votes in the wrong file and show them with none."""
+    row = db.execute("SELECT value FROM settings WHERE name = 'vote_shards'").fetchone()
+    stored = int(row[0]) if row else None
+    if stored not in (None, 0, VOTE_SHARDS):
+        raise RuntimeError(f"{DB} keeps its votes in {stored} shards but VOTE_SHARDS={VOTE_SHARDS}; "
+                           "the shard count cannot change once votes are sharded")
+    if VOTE_SHARDS and not moving_votes and db.execute("SELECT 1 FROM votes LIMIT 1").fetchone():
+        raise RuntimeError(f"{DB} has unsharded votes; run `flask --app app shard-votes` with "
+                           f"VOTE_SHARDS={VOTE_SHARDS} to move them into the shards first")
+    if stored != VOTE_SHARDS:
+        db.execute("INSERT OR REPLACE INTO settings (name, value) VALUES ('vote_shards', ?)", (str(VOTE_SHARDS),))
 
 # ---------------- Utils -------------
 def auto_split_options(question: str):
@@ -93,18 +265,62 @@ def auto_split_options(question: str):
                 return parts
     return None
 
+def validate_poll(question, options=()):
+    """Options for a new poll, or ValueError with the message create_poll() shows.
+
+    A question that auto-splits (see auto_split_options) supplies its own
+    options; otherwise the non-blank entries of options are used."""
+    options = auto_split_options(question) or [o.strip() for o in options if o and o.strip()]
+    if not (2 <= len(options) <= 4):
+        raise ValueError("Provide 2 to 4 options.")
+    if len(question) == 0 or len(question) > 120:
+        raise ValueError("Question is required (1–120 chars).")
+    return options
+
 def generate_vote_token():
     return str(uuid.uuid4())
 
 def generate_creator_secret():
     return str(uuid.uuid4())
 
+def generate_creator_key():
+    """Identifies one creator across all their polls; the portfolio page's secret."""
+    return str(uuid.uuid4())
+
+def valid_creator_key(key):
+    """True only for keys shaped like generate_creator_key()'s: the key is a
+    bearer credential for the portfolio page, so short or chosen strings are refused."""
+    if not isinstance(key, str):
+        return False
+    try:
+        return str(uuid.UUID(key)) == key
+    except ValueError:
+        return False
+
 def get_device_hash(request):
     ua = request.headers.get('User-Agent', '')
     ip = request.remote_addr or ''
     return hashlib.md5(f"{ua}:{ip}".encode()).hexdigest()
 
-def generate_insights(poll_id, results, total_votes):
+# A poll looks stuffed when each device (User-Agent + IP) or each IP accounts
+# for this many votes on average.
+SUSPICIOUS_VOTES_PER_DEVICE = 1.5
+SUSPICIOUS_VOTES_PER_IP = 5
+
+def participation_stats(poll_id, total_votes):
+    """Estimated unique devices and IPs (HyperLogLog) and a concentration warning, if any."""
+    devices, ips = hll.estimate(get_vote_db(poll_id), poll_id)
+    # The estimates are a couple of percent off; never show more voters than votes.
+    devices, ips = min(devices, total_votes), min(ips, total_votes)
+    suspicious = None
+    if total_votes >= 20:
+        if devices and total_votes / devices >= SUSPICIOUS_VOTES_PER_DEVICE:
+            suspicious = f"{total_votes} votes came from about {devices} devices"
+        elif ips and total_votes / ips >= SUSPICIOUS_VOTES_PER_IP:
+            suspicious = f"{total_votes} votes came from about {ips} IP addresses"
+    return {"unique_devices": devices, "unique_ips": ips, "suspicious": suspicious}
+
+def generate_insights(poll_id, results, total_votes, participation=None):
     """Generate AI-like insights for polls with 20+ votes"""
     if total_votes < 20:
         return None
@@ -137,19 +353,51 @@ def generate_insights(poll_id, results, total_votes):
             insights.append("Very competitive: Top options are neck-and-neck")
         elif gap > 30:
             insights.append("Decisive outcome: Clear preference established")
+
+    # Who voted, from the poll's device/IP sketches
+    if participation:
+        if participation["suspicious"]:
+            insights.append(f"Suspicious concentration: {participation['suspicious']}")
+        else:
+            insights.append(f"Broad participation: about {participation['unique_devices']} distinct devices")
     
     return " • ".join(insights)
 
+def load_frozen_results(poll_id):
+    """Final (results, total) of a poll the scheduler has closed, else None."""
+    if expiry_wheel is None or poll_id in expiry_wheel:
+        return None  # scheduler off, or the poll is still open
+    frozen = frozen_results.get(poll_id)
+    if frozen is None:
+        row = get_db().execute("SELECT final_results FROM polls WHERE id=? AND closed=1", (poll_id,)).fetchone()
+        if not row or not row[0]:
+            return None
+        snapshot = json.loads(row[0])
+        frozen = remember_frozen(poll_id, [tuple(r) for r in snapshot["results"]], snapshot["total_votes"])
+    return frozen
+
+def remember_frozen(poll_id, results, total):
+    if len(frozen_results) >= FROZEN_RESULTS_MAX:
+        del frozen_results[next(iter(frozen_results))]
+    frozen = frozen_results[poll_id] = (results, total)
+    return frozen
+
 def poll_results(poll_id: int):
+    frozen = load_frozen_results(poll_id)
+    if frozen:
+        metrics.cache_hit("frozen_results")
+        return frozen
     db = get_db()
+    vote_db = get_vote_db(poll_id)
+    if tally_engine:
+        return tally_engine.results(db, vote_db, poll_id)
     c = db.cursor()
-    c.execute("SELECT id, text FROM options WHERE poll_id=?", (poll_id,))
+    c.execute("SELECT id, text FROM options WHERE poll_id=? ORDER BY id", (poll_id,))
     options = c.fetchall()
     results = []
     total = 0
     for row in options:
-        c.execute("SELECT COUNT(*) FROM votes WHERE option_id=?", (row['id'],))
-        cnt = c.fetchone()[0]
+        cnt = vote_db.execute("SELECT COUNT(*) FROM votes WHERE option_id=?", (row['id'],)).fetchone()[0]
         total += cnt
         results.append((row['text'], cnt, row['id']))
     
@@ -166,43 +414,132 @@ def create_poll():
         question = request.form["question"].strip()
         hide_results = 1 if request.form.get("hide_results") else 0
 
-        auto = auto_split_options(question)
-        if auto:
-            options = auto
-        else:
-            try:
-                n = int(request.form.get("num_options", "2"))
-            except ValueError:
-                n = 2
-            n = max(2, min(4, n))
-            options = []
-            for i in range(1, n + 1):
-                val = (request.form.get(f"option{i}") or "").strip()
-                if val:
-                    options.append(val)
-
-        if not (2 <= len(options) <= 4):
-            return "Provide 2 to 4 options.", 400
-        if len(question) == 0 or len(question) > 120:
-            return "Question is required (1–120 chars).", 400
+        try:
+            n = int(request.form.get("num_options", "2"))
+        except ValueError:
+            n = 2
+        n = max(2, min(4, n))
+        form_options = [request.form.get(f"option{i}") for i in range(1, n + 1)]
+
+        try:
+            options = validate_poll(question, form_options)
+        except ValueError as e:
+            return str(e), 400
 
         expiry = (datetime.datetime.now() + datetime.timedelta(hours=24)).isoformat()
         creator_secret = generate_creator_secret()
+        creator_key = request.cookies.get("creator_key")
+        if not valid_creator_key(creator_key):
+            creator_key = generate_creator_key()
         
         db = get_db()
         c = db.cursor()
-        c.execute("INSERT INTO polls (question, expiry, hide_results, creator_secret) VALUES (?, ?, ?, ?)", 
-                  (question, expiry, hide_results, creator_secret))
+        c.execute("INSERT INTO polls (question, expiry, hide_results, creator_secret, creator_key, created_at) VALUES (?, ?, ?, ?, ?, datetime('now'))", 
+                  (question, expiry, hide_results, creator_secret, creator_key))
         poll_id = c.lastrowid
         for opt in options:
             c.execute("INSERT INTO options (poll_id, text) VALUES (?, ?)", (poll_id, opt))
         db.commit()
-        return redirect(url_for("share_poll", poll_id=poll_id, secret=creator_secret))
+        schedule_expiry(poll_id, expiry)
+        resp = make_response(redirect(url_for("share_poll", poll_id=poll_id, secret=creator_secret)))
+        resp.set_cookie("creator_key", creator_key, max_age=365 * 86400, httponly=True, samesite="Lax")
+        return resp
 
     return render_template("create.html")
 
+MAX_BULK_POLLS = int(os.environ.get('BULK_CREATE_MAX', 1000))
+
+def parse_poll_specs(specs):
+    """Validate bulk poll specs ({"question", "options"?, "hide_results"?}).
+
+    Returns (polls, errors): polls as (question, options, hide_results)
+    tuples, errors as {"index", "error"} dicts for the specs that failed."""
+    polls, errors = [], []
+    for i, spec in enumerate(specs):
+        if not isinstance(spec, dict) or not isinstance(spec.get("question"), str):
+            errors.append({"index": i, "error": "Each poll needs a \"question\" string."})
+            continue
+        question = spec["question"].strip()
+        options = spec.get("options") or []
+        if not isinstance(options, list) or not all(isinstance(o, str) for o in options):
+            errors.append({"index": i, "error": "\"options\" must be a list of strings."})
+            continue
+        try:
+            polls.append((question, validate_poll(question, options), 1 if spec.get("hide_results") else 0))
+        except ValueError as e:
+            errors.append({"index": i, "error": str(e)})
+    return polls, errors
+
+def known_creator_key(db, key):
+    """True if key is a creator key this server issued and has polls under."""
+    return valid_creator_key(key) and db.execute(
+        "SELECT 1 FROM polls WHERE creator_key=? LIMIT 1", (key,)).fetchone() is not None
+
+def insert_polls(db, polls, creator_key, hours=24):
+    """Insert validated polls with two executemany() calls in one transaction.
+
+    Ids are assigned from MAX(id) under BEGIN IMMEDIATE, since executemany()
+    does not report them. Returns [(poll_id, creator_secret), ...] in order."""
+    expiry = (datetime.datetime.now() + datetime.timedelta(hours=hours)).isoformat()
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        first_id = db.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM polls").fetchone()[0]
+        created = [(first_id + i, generate_creator_secret()) for i in range(len(polls))]
+        db.executemany("""INSERT INTO polls (id, question, expiry, hide_results, creator_secret, creator_key, created_at)
+                          VALUES (?, ?, ?, ?, ?, ?, datetime('now'))""",
+                       [(poll_id, question, expiry, hide_results, secret, creator_key)
+                        for (poll_id, secret), (question, _, hide_results) in zip(created, polls)])
+        db.executemany("INSERT INTO options (poll_id, text) VALUES (?, ?)",
+                       [(poll_id, opt) for (poll_id, _), (_, options, _) in zip(created, polls) for opt in options])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    for poll_id, _ in created:
+        schedule_expiry(poll_id, expiry)
+    return created
+
+def poll_links(poll_id, secret):
+    return {
+        "id": poll_id,
+        "poll_link": url_for("poll_view", poll_id=poll_id, _external=True),
+        "share_link": url_for("share_poll", poll_id=poll_id, secret=secret, _external=True),
+        "creator_link": url_for("creator_dashboard", poll_id=poll_id, secret=secret, _external=True),
+    }
+
+@app.route("/api/polls/bulk", methods=["POST"])
+def bulk_create_polls():
+    """Create many polls from {"polls": [...]} in one transaction; all or nothing.
+
+    Pass the "creator_key" an earlier call returned to add to the same portfolio."""
+    payload = request.get_json(silent=True)
+    specs = payload.get("polls") if isinstance(payload, dict) else payload
+    if not isinstance(specs, list) or not specs:
+        return jsonify({"error": "Send a JSON list of polls, or {\"polls\": [...]}."}), 400
+    if len(specs) > MAX_BULK_POLLS:
+        return jsonify({"error": f"At most {MAX_BULK_POLLS} polls per request."}), 413
+    creator_key = payload.get("creator_key") if isinstance(payload, dict) else None
+    if creator_key is not None and not known_creator_key(get_db(), creator_key):
+        return jsonify({"error": "\"creator_key\" must be a key returned by an earlier call."}), 400
+    polls, errors = parse_poll_specs(specs)
+    if errors:
+        return jsonify({"errors": errors}), 400
+    creator_key = creator_key or generate_creator_key()
+    created = insert_polls(get_db(), polls, creator_key)
+    return jsonify({
+        "creator_key": creator_key,
+        "portfolio_link": url_for("creator_portfolio", creator_key=creator_key, _external=True),
+        "polls": [poll_links(poll_id, secret) for poll_id, secret in created],
+    }), 201
+
 @app.route("/poll/<int:poll_id>", methods=["GET", "POST"])
 def poll_view(poll_id):
+    if request.method == "POST" and vote_limiter:
+        # Reject floods before touching SQLite; the single writer is the bottleneck.
+        throttled = vote_limiter.check(poll_id, get_device_hash(request), request.remote_addr)
+        if throttled:
+            return "Too many votes, please slow down.", 429, {"Retry-After": str(throttled[1])}
+
     db = get_db()
     c = db.cursor()
     c.execute("SELECT question, expiry, hide_results FROM polls WHERE id=?", (poll_id,))
@@ -216,12 +553,12 @@ def poll_view(poll_id):
     if expired:
         return redirect(url_for("results_view", poll_id=poll_id))
 
+    vote_db = get_vote_db(poll_id)
     vote_token = request.cookies.get("vote_token")
     has_voted = False
     user_choice = None
     if vote_token:
-        c.execute("SELECT option_id FROM votes WHERE poll_id=? AND vote_token=?", (poll_id, vote_token))
-        r = c.fetchone()
+        r = vote_db.execute("SELECT option_id FROM votes WHERE poll_id=? AND vote_token=?", (poll_id, vote_token)).fetchone()
         if r:
             has_voted = True
             user_choice = r[0]
@@ -230,21 +567,28 @@ def poll_view(poll_id):
         option_id = request.form.get("option")
         if not option_id:
             return "No option selected.", 400
-        c.execute("SELECT 1 FROM options WHERE id=? AND poll_id=?", (option_id, poll_id))
-        if not c.fetchone():
+        c.execute("SELECT id FROM options WHERE id=? AND poll_id=?", (option_id, poll_id))
+        r = c.fetchone()
+        if not r:
             return "Invalid option.", 400
+        option_id = r[0]
 
         new_token = generate_vote_token()
-        c.execute("INSERT INTO votes (poll_id, option_id, vote_token, device_hash, ip) VALUES (?, ?, ?, ?, ?)",
-                  (poll_id, option_id, new_token, get_device_hash(request), request.remote_addr))
-        db.commit()
+        device_hash = get_device_hash(request)
+        vote_id = vote_db.execute("INSERT INTO votes (poll_id, option_id, vote_token, device_hash, ip) VALUES (?, ?, ?, ?, ?)",
+                                  (poll_id, option_id, new_token, device_hash, request.remote_addr)).lastrowid
+        hll.record(vote_db, poll_id, device_hash, request.remote_addr)
+        vote_db.commit()
+        metrics.VOTES.inc(str(poll_id))
 
         resp = make_response(redirect(url_for("results_view", poll_id=poll_id)))
         resp.set_cookie("vote_token", new_token, max_age=86400, httponly=True, samesite="Strict")
         
         # Check if we need to generate insights
-        c.execute("SELECT COUNT(*) FROM votes WHERE poll_id=?", (poll_id,))
-        total_after_vote = c.fetchone()[0]
+        if tally_engine:
+            total_after_vote = tally_engine.record_vote(db, vote_db, poll_id, option_id, vote_id)
+        else:
+            total_after_vote = vote_db.execute("SELECT COUNT(*) FROM votes WHERE poll_id=?", (poll_id,)).fetchone()[0]
         
         if total_after_vote >= 20:
             try:
@@ -252,20 +596,24 @@ def poll_view(poll_id):
                 row = c.fetchone()
                 insights_generated = row[0] if row else 0
                 if not insights_generated:
-                    results, total = poll_results(poll_id)
-                    insight_text = generate_insights(poll_id, results, total)
-                    if insight_text:
-                        c.execute("INSERT INTO insights (poll_id, insight_text) VALUES (?, ?)", (poll_id, insight_text))
-                        c.execute("UPDATE polls SET insights_generated=1 WHERE id=?", (poll_id,))
-                        db.commit()
+                    with metrics.INSIGHTS_SECONDS.time():
+                        results, total = poll_results(poll_id)
+                        insight_text = generate_insights(poll_id, results, total, participation_stats(poll_id, total))
+                        if insight_text:
+                            c.execute("INSERT INTO insights (poll_id, insight_text) VALUES (?, ?)", (poll_id, insight_text))
+                            c.execute("UPDATE polls SET insights_generated=1 WHERE id=?", (poll_id,))
+                            db.commit()
             except sqlite3.OperationalError:
                 # Column doesn't exist yet, skip insights
                 pass
         
-        socketio.emit("vote_cast", {"poll_id": poll_id, "total_votes": total_after_vote})
+        with metrics.SOCKET_EMIT_SECONDS.time("vote_cast"):
+            socketio.emit("vote_cast", {"poll_id": poll_id, "total_votes": total_after_vote})
+        for listener in vote_listeners:
+            listener(poll_id, total_after_vote)
         return resp
 
-    c.execute("SELECT id, text FROM options WHERE poll_id=?", (poll_id,))
+    c.execute("SELECT id, text FROM options WHERE poll_id=? ORDER BY id", (poll_id,))
     options = c.fetchall()
     results, total = ([], 0)
     if not hide:
@@ -301,12 +649,12 @@ def results_view(poll_id):
 
     results, total = poll_results(poll_id)
 
+    vote_db = get_vote_db(poll_id)
     vote_token = request.cookies.get("vote_token")
     has_voted = False
     user_choice = None
     if vote_token:
-        c.execute("SELECT option_id FROM votes WHERE poll_id=? AND vote_token=?", (poll_id, vote_token))
-        r = c.fetchone()
+        r = vote_db.execute("SELECT option_id FROM votes WHERE poll_id=? AND vote_token=?", (poll_id, vote_token)).fetchone()
         if r:
             has_voted = True
             user_choice = r[0]
@@ -329,13 +677,54 @@ def results_view(poll_id):
                            is_expired=expired,
                            insights=insights)
 
+# /api/results formats: "json" is the full payload; "compact" and "msgpack"
+# carry only counts by option index, for clients that already know the options.
+COMPACT_MIMETYPE = "application/vnd.pollapp.compact+json"
+RESULTS_FORMATS = {"json": "application/json", "compact": COMPACT_MIMETYPE, "msgpack": "application/msgpack"}
+
 @app.route("/api/results/<int:poll_id>")
 def api_results(poll_id):
+    fmt = negotiate_results_format(request.args.get("format"), request.headers.get("Accept"))
+    body, mimetype = render_results(poll_id, fmt)
+    resp = Response(body, mimetype=mimetype)
+    resp.vary.add("Accept")
+    if poll_id in frozen_results:
+        # Final results never change again; let browsers and CDNs keep them,
+        # and compress each variant only once.
+        resp.cache_control.public = True
+        resp.cache_control.max_age = 86400
+        g.precompressed_key = ("api_results", poll_id, fmt)
+    return resp
+
+def negotiate_results_format(requested, accept):
+    """?format= if it names a known format, else the best match for the Accept header."""
+    if requested not in RESULTS_FORMATS:
+        offers = ["application/json", COMPACT_MIMETYPE, "application/msgpack", "application/x-msgpack"]
+        best = parse_accept_header(accept, MIMEAccept).best_match(offers, default="application/json")
+        requested = {COMPACT_MIMETYPE: "compact", "application/json": "json"}.get(best, "msgpack")
+    if requested == "msgpack" and msgpack is None:
+        return "compact"
+    return requested
+
+def results_payload(poll_id):
     results, total = poll_results(poll_id)
-    return jsonify({
+    return {
         "results": [{"text": t, "count": c, "percentage": p} for (t, c, oid, p) in results],
         "total_votes": total
-    })
+    }
+
+def compact_results_payload(poll_id):
+    results, total = poll_results(poll_id)
+    return {"counts": [c for (t, c, oid, p) in results], "total_votes": total}
+
+def render_results(poll_id, fmt):
+    """(body, mimetype) of poll_id's results in one of RESULTS_FORMATS. Needs an app context."""
+    if fmt == "json":
+        return app.json.response(results_payload(poll_id)).get_data(), RESULTS_FORMATS["json"]
+    payload = compact_results_payload(poll_id)
+    if fmt == "msgpack":
+        return msgpack.packb(payload), RESULTS_FORMATS["msgpack"]
+    return json.dumps(payload, separators=(",", ":")).encode(), RESULTS_FORMATS["compact"]
 
 @app.route("/share/<int:poll_id>")
 def share_poll(poll_id):
@@ -376,7 +765,7 @@ def creator_dashboard(poll_id, secret):
     c = db.cursor()
     
     try:
-        c.execute("SELECT question, expiry, hide_results, creator_secret, created_at FROM polls WHERE id=?", (poll_id,))
+        c.execute("SELECT question, expiry, hide_results, creator_secret, created_at, creator_key FROM polls WHERE id=?", (poll_id,))
         row = c.fetchone()
         if not row:
             return "Poll not found", 404
@@ -405,15 +794,18 @@ def creator_dashboard(poll_id, secret):
     
     # Get vote timeline (last 24 hours)
     try:
-        c.execute("""SELECT DATE(created_at) as vote_date, COUNT(*) as count 
+        timeline = get_vote_db(poll_id).execute("""SELECT DATE(created_at) as vote_date, COUNT(*) as count 
                      FROM votes WHERE poll_id=? 
                      GROUP BY DATE(created_at) 
-                     ORDER BY vote_date DESC LIMIT 7""", (poll_id,))
-        timeline = c.fetchall()
+                     ORDER BY vote_date DESC LIMIT 7""", (poll_id,)).fetchall()
     except sqlite3.OperationalError:
         timeline = []
     
+    participation = participation_stats(poll_id, total)
+
     poll_link = url_for("poll_view", poll_id=poll_id, _external=True)
+    export_link = url_for("export_votes", poll_id=poll_id, secret=secret)
+    portfolio_link = url_for("creator_portfolio", creator_key=row["creator_key"]) if row["creator_key"] else None
     
     return render_template("creator_dashboard.html",
                          poll_id=poll_id,
@@ -422,13 +814,177 @@ def creator_dashboard(poll_id, secret):
                          total=total,
                          insights=insights,
                          timeline=timeline,
+                         participation=participation,
                          poll_link=poll_link,
+                         export_link=export_link,
+                         portfolio_link=portfolio_link,
                          created_at=created_dt,
                          expiry_dt=expiry_dt,
                          is_expired=expired)
 
+PORTFOLIO_PAGE_SIZE = 50
+
+@app.route("/creator/portfolio/<creator_key>")
+def creator_portfolio(creator_key):
+    """Every poll made with a creator key, newest first, PORTFOLIO_PAGE_SIZE at a time.
+
+    Pages continue from the (created_at, id) of the last poll shown
+    (?before=<poll id>), so each page is one range scan of idx_polls_creator
+    however many polls come before it."""
+    if not valid_creator_key(creator_key):
+        return "No polls for this creator key", 404
+    db = get_db()
+    before = request.args.get("before", type=int)
+    sql = """SELECT id, question, expiry, closed, final_results, creator_secret, created_at
+             FROM polls WHERE creator_key=?"""
+    params = [creator_key]
+    if before:
+        sql += " AND (created_at, id) < (SELECT created_at, id FROM polls WHERE id=? AND creator_key=?)"
+        params += [before, creator_key]
+    sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+    params.append(PORTFOLIO_PAGE_SIZE + 1)
+    rows = db.execute(sql, params).fetchall()
+    if not rows and not before:
+        return "No polls for this creator key", 404
+    next_link = url_for("creator_portfolio", creator_key=creator_key, before=rows[PORTFOLIO_PAGE_SIZE - 1]["id"]) \
+        if len(rows) > PORTFOLIO_PAGE_SIZE else None
+    rows = rows[:PORTFOLIO_PAGE_SIZE]
+
+    all_results = poll_results_many(rows)
+    now = datetime.datetime.now()
+    polls = []
+    for row in rows:
+        results, total = all_results[row["id"]]
+        leader = max(results, key=lambda r: r[1]) if total else None
+        polls.append({
+            "id": row["id"],
+            "question": row["question"],
+            "created_at": row["created_at"],
+            "expiry_dt": datetime.datetime.fromisoformat(row["expiry"]),
+            "is_expired": bool(row["closed"]) or now > datetime.datetime.fromisoformat(row["expiry"]),
+            "total": total,
+            "leader": leader,
+            "dashboard_link": url_for("creator_dashboard", poll_id=row["id"], secret=row["creator_secret"]),
+        })
+    return render_template("creator_portfolio.html",
+                           polls=polls,
+                           next_link=next_link,
+                           first_link=url_for("creator_portfolio", creator_key=creator_key) if before else None)
+
+def poll_results_many(rows):
+    """poll_results() for a page of polls rows, batched: closed polls come from
+    their stored final results, the rest from one options query and one
+    tally.load_counts() per vote store. Returns {poll_id: (results, total)}."""
+    all_results = {}
+    open_ids = []
+    for row in rows:
+        if row["closed"] and row["final_results"]:
+            snapshot = json.loads(row["final_results"])
+            all_results[row["id"]] = ([tuple(r) for r in snapshot["results"]], snapshot["total_votes"])
+        else:
+            open_ids.append(row["id"])
+    if not open_ids:
+        return all_results
+
+    options = {poll_id: [] for poll_id in open_ids}
+    marks = ",".join("?" * len(open_ids))
+    for option_id, poll_id, text in get_db().execute(
+            f"SELECT id, poll_id, text FROM options WHERE poll_id IN ({marks}) ORDER BY id", open_ids):
+        options[poll_id].append((option_id, text))
+    by_store = {}
+    for poll_id in open_ids:
+        by_store.setdefault(shard_for(poll_id) if VOTE_SHARDS else 0, []).append(poll_id)
+    counts = {}
+    for poll_ids in by_store.values():
+        counts.update(tally.load_counts(get_vote_db(poll_ids[0]), poll_ids))
+
+    for poll_id in open_ids:
+        poll_counts = counts[poll_id]
+        total = sum(poll_counts.get(option_id, 0) for option_id, _ in options[poll_id])
+        all_results[poll_id] = ([(text, poll_counts.get(option_id, 0), option_id,
+                                  round(poll_counts.get(option_id, 0) * 100.0 / total, 1) if total else 0.0)
+                                 for option_id, text in options[poll_id]], total)
+    return all_results
+
+EXPORT_COLUMNS = ("vote_id", "option", "created_at", "device_hash")
+
+def parse_export_time(value):
+    """ISO date/time from a query string -> the 'YYYY-MM-DD HH:MM:SS' (UTC) form votes are stored in.
+
+    Times with an offset are converted to UTC; times without one are taken as UTC."""
+    if not value:
+        return None
+    moment = datetime.datetime.fromisoformat(value)
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(datetime.timezone.utc)
+    return moment.strftime("%Y-%m-%d %H:%M:%S")
+
+@app.route("/creator/<int:poll_id>/<secret>/export")
+def export_votes(poll_id, secret):
+    """Stream a poll's raw votes as CSV (default) or NDJSON, optionally limited
+    to ?since=...&until=... (ISO times, UTC unless they carry an offset, until exclusive)."""
+    db = get_db()
+    row = db.execute("SELECT creator_secret FROM polls WHERE id=?", (poll_id,)).fetchone()
+    if not row:
+        return "Poll not found", 404
+    if not row["creator_secret"] or row["creator_secret"] != secret:
+        return "Access denied", 403
+
+    fmt = request.args.get("format", "csv")
+    if fmt not in ("csv", "ndjson"):
+        return "Unknown export format", 400
+    try:
+        since = parse_export_time(request.args.get("since"))
+        until = parse_export_time(request.args.get("until"))
+    except ValueError:
+        return "since/until must be ISO dates or times", 400
+
+    options = {oid: text for oid, text in db.execute("SELECT id, text FROM options WHERE poll_id=?", (poll_id,))}
+    sql = "SELECT id, option_id, created_at, device_hash FROM votes WHERE poll_id=?"
+    params = [poll_id]
+    if since:
+        sql += " AND created_at >= ?"
+        params.append(since)
+    if until:
+        sql += " AND created_at < ?"
+        params.append(until)
+    sql += " ORDER BY created_at, id"
+
+    def generate():
+        # Iterating the cursor steps SQLite's statement one row at a time, so
+        # memory stays flat however many votes the poll has.
+        cursor = get_vote_db(poll_id).execute(sql, params)
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        if fmt == "csv":
+            writer.writerow(EXPORT_COLUMNS)
+        rows = 0
+        start = time.perf_counter()
+        for vote_id, option_id, created_at, device_hash in cursor:
+            values = (vote_id, options.get(option_id), created_at, device_hash)
+            if fmt == "csv":
+                writer.writerow(values)
+            else:
+                buf.write(json.dumps(dict(zip(EXPORT_COLUMNS, values))) + "\n")
+            rows += 1
+            if buf.tell() >= 64 * 1024:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+        yield buf.getvalue()
+        elapsed = time.perf_counter() - start
+        metrics.EXPORT_ROWS.inc(fmt, amount=rows)
+        app.logger.info("export poll %s: %d rows as %s in %.2fs (%.0f rows/s)",
+                        poll_id, rows, fmt, elapsed, rows / elapsed if elapsed else 0)
+
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    response = Response(stream_with_context(generate()), mimetype=mimetype)
+    response.headers["Content-Disposition"] = f"attachment; filename=poll-{poll_id}-votes.{fmt}"
+    return response
+
 @app.route("/qr/<int:poll_id>")
 def qr_code(poll_id):
+    import qrcode  # pulls in PIL, so only /qr pays for it
     link = url_for("poll_view", poll_id=poll_id, _external=True)
     img = qrcode.make(link)
     buf = io.BytesIO()
@@ -436,9 +992,188 @@ def qr_code(poll_id):
     buf.seek(0)
     return send_file(buf, mimetype="image/png")
 
+# ---------------- Admin commands -------------
+@app.cli.command("vote-stats")
+def vote_stats():
+    """Votes per vote store and the busiest polls, across all shards."""
+    busiest = []
+    for shard, vote_db in enumerate(all_vote_dbs()):
+        votes, polls = vote_db.execute("SELECT COUNT(*), COUNT(DISTINCT poll_id) FROM votes").fetchone()
+        print(f"{shard_path(shard) if VOTE_SHARDS else DB}: {votes} votes in {polls} polls")
+        busiest += vote_db.execute("SELECT poll_id, COUNT(*) FROM votes GROUP BY poll_id ORDER BY 2 DESC LIMIT 10").fetchall()
+    for poll_id, votes in sorted(busiest, key=lambda r: r[1], reverse=True)[:10]:
+        print(f"  poll {poll_id}: {votes} votes")
+
+@app.cli.command("shard-votes")
+def shard_votes():
+    """Move votes recorded before VOTE_SHARDS was set from DB into their shards."""
+    if not VOTE_SHARDS:
+        print("VOTE_SHARDS is not set.")
+        return
+    global _schema_ready
+    db = g._database = open_db()
+    create_schema(db, moving_votes=True)
+    _schema_ready = True
+    moved = 0
+    for (poll_id,) in db.execute("SELECT DISTINCT poll_id FROM votes").fetchall():
+        vote_db = get_vote_db(poll_id)
+        # The copy and the delete commit in different files. The shard
+        # remembers the last vote id it copied, in the same transaction as
+        # the copy, so a rerun after a crash between the two does not copy
+        # those votes again.
+        vote_db.execute(MOVED_VOTES_SCHEMA)
+        row = vote_db.execute("SELECT last_vote_id FROM moved_votes WHERE poll_id=?", (poll_id,)).fetchone()
+        rows = db.execute("""SELECT id, poll_id, option_id, vote_token, device_hash, ip, created_at
+                             FROM votes WHERE poll_id=? AND id > ? ORDER BY id""",
+                          (poll_id, row[0] if row else 0)).fetchall()
+        if rows:
+            vote_db.executemany("""INSERT INTO votes (poll_id, option_id, vote_token, device_hash, ip, created_at)
+                                   VALUES (?, ?, ?, ?, ?, ?)""", [tuple(r)[1:] for r in rows])
+            vote_db.execute("INSERT OR REPLACE INTO moved_votes (poll_id, last_vote_id) VALUES (?, ?)",
+                            (poll_id, rows[-1]["id"]))
+            vote_db.execute("DELETE FROM tallies WHERE poll_id=?", (poll_id,))
+            vote_db.execute("DELETE FROM poll_sketches WHERE poll_id=?", (poll_id,))
+            vote_db.commit()
+        last_id = rows[-1]["id"] if rows else row[0]
+        db.execute("DELETE FROM votes WHERE poll_id=? AND id <= ?", (poll_id, last_id))
+        db.execute("DELETE FROM tallies WHERE poll_id=?", (poll_id,))
+        db.execute("DELETE FROM poll_sketches WHERE poll_id=?", (poll_id,))
+        db.commit()
+        moved += len(rows)
+    print(f"Moved {moved} votes into {VOTE_SHARDS} shards.")
+
+@app.cli.command("import-polls")
+@click.argument("path", type=click.File("r"))
+@click.option("--base-url", default="http://localhost:5000", help="Host the printed links point at.")
+@click.option("--creator-key", help="Add the polls to this creator's portfolio instead of a new one.")
+def import_polls(path, base_url, creator_key):
+    """Create polls from a JSONL file, one {"question", "options"?, "hide_results"?} per line.
+
+    Prints each poll's links as a JSON line; nothing is created if any line is invalid."""
+    specs, line_numbers, problems = [], [], []
+    for number, line in enumerate(path, 1):
+        if line.strip():
+            try:
+                specs.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                problems.append((number, f"invalid JSON ({e.msg})"))
+                continue
+            line_numbers.append(number)
+    polls, errors = parse_poll_specs(specs)
+    problems += [(line_numbers[error["index"]], error["error"]) for error in errors]
+    for number, message in sorted(problems):
+        click.echo(f"line {number}: {message}", err=True)
+    if problems or not polls:
+        raise SystemExit(1)
+    init_db()
+    if creator_key and not known_creator_key(get_db(), creator_key):
+        raise click.BadParameter("not a creator key of any existing poll", param_hint="--creator-key")
+    start = time.perf_counter()
+    creator_key = creator_key or generate_creator_key()
+    created = insert_polls(get_db(), polls, creator_key)
+    elapsed = time.perf_counter() - start
+    with app.test_request_context(base_url=base_url):
+        for poll_id, secret in created:
+            click.echo(json.dumps(poll_links(poll_id, secret)))
+        portfolio_link = url_for("creator_portfolio", creator_key=creator_key, _external=True)
+    click.echo(f"Imported {len(created)} polls in {elapsed:.2f}s ({len(created) / elapsed:.0f} polls/s).", err=True)
+    click.echo(f"All of them: {portfolio_link}", err=True)
+
+# ---------------- Expiry scheduler -------------
+_expiry_started = False
+
+def schedule_expiry(poll_id, expiry_iso):
+    if expiry_wheel is not None:
+        expiry_wheel.schedule(poll_id, datetime.datetime.fromisoformat(expiry_iso).timestamp())
+
+def close_poll(poll_id):
+    """Freeze a poll's final tallies, store final insights and results, and announce it closed."""
+    db = get_db()
+    vote_db = get_vote_db(poll_id)
+    row = db.execute("SELECT closed FROM polls WHERE id=?", (poll_id,)).fetchone()
+    if not row or row[0]:
+        return
+    tally.checkpoint(db, vote_db, poll_id)
+    results, total = poll_results(poll_id)
+    with metrics.INSIGHTS_SECONDS.time():
+        insight_text = generate_insights(poll_id, results, total, participation_stats(poll_id, total))
+        if insight_text:
+            db.execute("INSERT INTO insights (poll_id, insight_text) VALUES (?, ?)", (poll_id, f"Final result: {insight_text}"))
+            db.execute("UPDATE polls SET insights_generated=1 WHERE id=?", (poll_id,))
+    snapshot = {"results": [list(r) for r in results], "total_votes": total}
+    db.execute("UPDATE polls SET closed=1, final_results=? WHERE id=?", (json.dumps(snapshot), poll_id))
+    db.commit()
+    remember_frozen(poll_id, results, total)
+    expiry.CLOSED.inc()
+    metrics.VOTES.remove(str(poll_id))
+
+    payload = dict(results_payload(poll_id), poll_id=poll_id)
+    with metrics.SOCKET_EMIT_SECONDS.time("poll_closed"):
+        socketio.emit("poll_closed", payload)
+    for listener in close_listeners:
+        listener(poll_id, payload)
+
+def schedule_open_polls():
+    """Put every open poll that is not on the wheel yet on it (served by idx_polls_open_expiry)."""
+    for poll_id, expiry_iso in get_db().execute("SELECT id, expiry FROM polls WHERE closed = 0"):
+        if poll_id not in expiry_wheel:
+            schedule_expiry(poll_id, expiry_iso)
+
+def expiry_loop():
+    # The first scan picks up polls created before this process started,
+    # including ones that expired while it was down (those close on the first
+    # tick); later scans pick up polls other processes created.
+    next_scan = 0
+    while True:
+        if time.time() >= next_scan:
+            next_scan = time.time() + EXPIRY_RESCAN_SECONDS
+            with app.app_context():
+                try:
+                    schedule_open_polls()
+                except sqlite3.Error:
+                    app.logger.exception("Scanning open polls failed")
+        socketio.sleep(expiry_wheel.tick)
+        due = expiry_wheel.advance(time.time())
+        if not due:
+            continue
+        with app.app_context():
+            for poll_id in due:
+                try:
+                    close_poll(poll_id)
+                except sqlite3.Error:
+                    app.logger.exception("Closing poll %s failed, retrying in %ss", poll_id, EXPIRY_RETRY_SECONDS)
+                    expiry_wheel.schedule(poll_id, time.time() + EXPIRY_RETRY_SECONDS)
+
+# ---------------- Tally checkpoints -------------
+_checkpointer_started = False
+
+def tally_checkpoint_loop():
+    interval = float(os.environ.get('TALLY_CHECKPOINT_SECONDS', 30))
+    while True:
+        socketio.sleep(interval)
+        with app.app_context():
+            try:
+                tally_engine.checkpoint_all(get_db(), get_vote_db)
+            except sqlite3.Error:
+                app.logger.exception("Tally checkpoint failed")
+
+@app.before_request
+def start_background_tasks():
+    global _checkpointer_started, _expiry_started
+    if tally_engine and not _checkpointer_started:
+        _checkpointer_started = True
+        socketio.start_background_task(tally_checkpoint_loop)
+    if expiry_wheel is not None and not _expiry_started:
+        _expiry_started = True
+        socketio.start_background_task(expiry_loop)
+
 @socketio.on("connect")
 def on_connect():
-    pass
+    metrics.SOCKET_CONNECTIONS.inc()
+
+@socketio.on("disconnect")
+def on_disconnect(*args):
+    metrics.SOCKET_CONNECTIONS.dec()
 
 if __name__ == "__main__":
     init_db()
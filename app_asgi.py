@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+ASGI serving mode for the polling app.
+
+Runs the same Flask app and database code as app.py, but the event loop owns
+the connections:
+
+- /socket.io is served by an asyncio Socket.IO server, so an idle viewer is a
+  parked coroutine instead of a greenlet or thread.
+- GET /api/results/<id> is handled natively, with the same format
+  negotiation and compression as the Flask view. Concurrent requests for the
+  same poll and variant share one database read, and the answer is reused for
+  ASGI_RESULTS_TTL seconds (default 0.5), or for good once the poll has
+  closed. At most ASGI_RESULTS_CACHE_MAX answers (default 10000) are kept,
+  and unknown poll ids are never cached.
+- Everything else, including vote POSTs, goes through a WSGI bridge to the
+  Flask app.
+
+The native results reads run on a bounded pool of ASGI_DB_THREADS threads
+(default 8) and the WSGI bridge on its own pool of ASGI_WSGI_THREADS
+(default 16), so a burst of requests queues for a pool instead of blocking
+the loop, and slow Flask requests (vote exports streaming to a slow client)
+cannot starve /api/results.
+vote_cast events are coalesced per poll to at most one per
+ASGI_EMIT_INTERVAL seconds (default 0.25).
+
+Run with a single worker, like the eventlet setup:
+    pip install uvicorn
+    uvicorn app_asgi:asgi_app --host 0.0.0.0 --port 8000
+"""
+
+import asyncio
+import io
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+os.environ.setdefault('SOCKETIO_ASYNC_MODE', 'threading')
+
+import socketio
+
+import app as pollapp
+import compress
+import metrics
+
+flask_app = pollapp.app
+db_pool = ThreadPoolExecutor(max_workers=int(os.environ.get('ASGI_DB_THREADS', 8)),
+                             thread_name_prefix="pollapp-db")
+wsgi_pool = ThreadPoolExecutor(max_workers=int(os.environ.get('ASGI_WSGI_THREADS', 16)),
+                               thread_name_prefix="pollapp-wsgi")
+RESULTS_TTL = float(os.environ.get('ASGI_RESULTS_TTL', 0.5))
+RESULTS_CACHE_MAX = int(os.environ.get('ASGI_RESULTS_CACHE_MAX', 10000))
+EMIT_INTERVAL = float(os.environ.get('ASGI_EMIT_INTERVAL', 0.25))
+RESULTS_PATH = re.compile(r"^/api/results/(\d+)$")
+
+sio = socketio.AsyncServer(async_mode="asgi", cors_allowed_origins="*")
+loop = None
+
+
+async def run_db(fn, *args):
+    return await loop.run_in_executor(db_pool, fn, *args)
+
+
+# ---------------- Live updates -------------
+_pending_totals = {}
+
+
+async def _flush_vote_cast(poll_id):
+    await asyncio.sleep(EMIT_INTERVAL)
+    total = _pending_totals.pop(poll_id)
+    with metrics.SOCKET_EMIT_SECONDS.time("vote_cast"):
+        await sio.emit("vote_cast", {"poll_id": poll_id, "total_votes": total})
+
+
+def _queue_vote_cast(poll_id, total_votes):
+    # On the loop: the first vote in a window schedules the emit, later ones
+    # only update the total it will carry. Cached answers predate the vote, so
+    # clients refetching on vote_cast must not get them.
+    _invalidate_results(poll_id)
+    if poll_id not in _pending_totals:
+        loop.create_task(_flush_vote_cast(poll_id))
+    _pending_totals[poll_id] = max(total_votes, _pending_totals.get(poll_id, 0))
+
+
+def on_vote(poll_id, total_votes):
+    """Vote listener; runs on a pool thread inside the Flask vote handler."""
+    loop.call_soon_threadsafe(_queue_vote_cast, poll_id, total_votes)
+
+
+def on_close(poll_id, payload):
+    """Close listener; runs on the expiry scheduler's thread."""
+    loop.call_soon_threadsafe(_closed, poll_id, payload)
+
+
+def _closed(poll_id, payload):
+    # Drop live answers; the next read renders the final results, cached for good.
+    _invalidate_results(poll_id)
+    loop.create_task(sio.emit("poll_closed", payload))
+
+
+pollapp.vote_listeners.append(on_vote)
+pollapp.close_listeners.append(on_close)
+
+
+@sio.event
+async def connect(sid, environ):
+    metrics.SOCKET_CONNECTIONS.inc()
+
+
+@sio.event
+async def disconnect(sid, *args):
+    metrics.SOCKET_CONNECTIONS.dec()
+
+
+# ---------------- /api/results -------------
+_results_cache = {}
+_results_inflight = {}
+
+
+def _invalidate_results(poll_id):
+    """Forget poll_id's cached answers, and detach reads already running so
+    later requests neither join them nor find their (older) answers cached."""
+    for key in [key for key in _results_cache if key[0] == poll_id]:
+        del _results_cache[key]
+    for key in [key for key in _results_inflight if key[0] == poll_id]:
+        del _results_inflight[key]
+
+
+def _render_results(poll_id, fmt, accept_encoding):
+    """(expires, body, mimetype, content_encoding, frozen) for one results variant.
+
+    expires is 0 for a poll that does not exist, so the answer is not cached."""
+    with flask_app.app_context():
+        body, mimetype = pollapp.render_results(poll_id, fmt)
+        frozen = poll_id in pollapp.frozen_results
+        exists = frozen or pollapp.get_db().execute("SELECT 1 FROM polls WHERE id=?", (poll_id,)).fetchone()
+        body, encoding = compress.encode(body, accept_encoding,
+                                         ("api_results", poll_id, fmt) if frozen else None)
+    if not exists:
+        expires = 0
+    else:
+        expires = float("inf") if frozen else time.monotonic() + RESULTS_TTL
+    return expires, body, mimetype, encoding, frozen
+
+
+def _cache_results(key, variant):
+    _results_cache.pop(key, None)
+    if variant[0] <= time.monotonic():
+        return
+    if len(_results_cache) >= RESULTS_CACHE_MAX:
+        del _results_cache[next(iter(_results_cache))]
+    _results_cache[key] = variant
+
+
+async def results_variant(poll_id, fmt, accept_encoding):
+    key = (poll_id, fmt, compress.negotiate(accept_encoding))
+    cached = _results_cache.get(key)
+    if cached and cached[0] > time.monotonic():
+        metrics.cache_hit("asgi_results")
+        return cached
+    inflight = _results_inflight.get(key)
+    if inflight:
+        metrics.cache_hit("asgi_results")
+        return await asyncio.shield(inflight)
+    metrics.cache_miss("asgi_results")
+    inflight = _results_inflight[key] = loop.create_future()
+    try:
+        variant = await run_db(_render_results, poll_id, fmt, accept_encoding)
+        if _results_inflight.get(key) is inflight:  # no vote or close since the read started
+            _cache_results(key, variant)
+        inflight.set_result(variant)
+        return variant
+    except Exception as e:
+        inflight.set_exception(e)
+        raise
+    finally:
+        if _results_inflight.get(key) is inflight:
+            del _results_inflight[key]
+
+
+async def api_results(poll_id, scope, send):
+    start = time.perf_counter()
+    headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope.get("headers", [])}
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    fmt = pollapp.negotiate_results_format(query.get("format", [None])[0], headers.get("accept"))
+    _, body, mimetype, encoding, frozen = await results_variant(poll_id, fmt, headers.get("accept-encoding"))
+    response_headers = [(b"content-type", mimetype.encode()),
+                        (b"content-length", str(len(body)).encode()),
+                        (b"vary", b"Accept, Accept-Encoding")]
+    if encoding:
+        response_headers.append((b"content-encoding", encoding.encode()))
+    if frozen:
+        response_headers.append((b"cache-control", b"public, max-age=86400"))
+    await send({"type": "http.response.start", "status": 200, "headers": response_headers})
+    await send({"type": "http.response.body", "body": body})
+    compress.BYTES_SENT.inc("api_results", encoding or "identity", amount=len(body))
+    metrics.REQUEST_SECONDS.observe(time.perf_counter() - start, "api_results", "GET")
+    metrics.REQUESTS.inc("api_results", "GET", "200")
+
+
+# ---------------- WSGI bridge -------------
+def build_environ(scope, body):
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", ""),
+        "PATH_INFO": scope["path"].encode().decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope.get("headers", []):
+        key = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if key == "CONTENT_TYPE":
+            environ["CONTENT_TYPE"] = value
+        elif key == "CONTENT_LENGTH":
+            environ["CONTENT_LENGTH"] = value
+        else:
+            key = "HTTP_" + key
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def run_wsgi(environ, send):
+    """Run the Flask app on a wsgi_pool thread, streaming its output through send."""
+    started = {}
+
+    def send_sync(message):
+        asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+    def start_response(status, headers, exc_info=None):
+        started["status"] = int(status.split(" ", 1)[0])
+        started["headers"] = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers]
+        return lambda data: send_body(data, more=True)
+
+    def send_body(data, more):
+        if "sent" not in started:
+            started["sent"] = True
+            send_sync({"type": "http.response.start", "status": started["status"], "headers": started["headers"]})
+        send_sync({"type": "http.response.body", "body": data, "more_body": more})
+
+    result = flask_app(environ, start_response)
+    try:
+        for chunk in result:
+            if chunk:
+                send_body(chunk, more=True)
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+    send_body(b"", more=False)
+
+
+async def wsgi_bridge(scope, receive, send):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    await loop.run_in_executor(wsgi_pool, run_wsgi, build_environ(scope, b"".join(chunks)), send)
+
+
+# ---------------- ASGI entry point -------------
+async def http_app(scope, receive, send):
+    if scope["type"] != "http":
+        return
+    match = RESULTS_PATH.match(scope["path"])
+    if match and scope["method"] == "GET":
+        await api_results(int(match.group(1)), scope, send)
+    else:
+        await wsgi_bridge(scope, receive, send)
+
+
+async def on_startup():
+    global loop
+    loop = asyncio.get_running_loop()
+    await run_db(pollapp.init_db)
+    pollapp.start_background_tasks()
+
+
+async def on_shutdown():
+    db_pool.shutdown(wait=False)
+    wsgi_pool.shutdown(wait=False)
+
+
+asgi_app = socketio.ASGIApp(sio, other_asgi_app=http_app, on_startup=on_startup, on_shutdown=on_shutdown)
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(asgi_app, host="0.0.0.0", port=int(os.environ.get('PORT', 8000)))
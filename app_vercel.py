@@ -5,21 +5,36 @@ This version removes WebSocket dependencies and uses polling for updates.
 """
 
 from flask import Flask, request, render_template, redirect, url_for, jsonify, make_response, send_file
-import sqlite3, datetime, qrcode, io, uuid, os, hashlib, tempfile
+import sqlite3, datetime, io, uuid, os, hashlib, tempfile, threading
+import metrics, ratelimit, sqltrace
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key')
 
 # Use temporary directory for database in serverless environment
-DB_PATH = os.path.join(tempfile.gettempdir(), "poll.db")
+DB_PATH = os.environ.get('POLL_DB', os.path.join(tempfile.gettempdir(), "poll.db"))
+
+metrics.init_app(app)
+sqltrace.init_app(app)
+vote_limiter = ratelimit.VoteLimiter.from_env()
+
+# Schema setup runs once per process on the first connection instead of at
+# import, so cold starts for routes that never touch the database stay cheap.
+_schema_ready = False
+_schema_lock = threading.Lock()
 
 def get_db():
-    db = sqlite3.connect(DB_PATH)
+    global _schema_ready
+    db = metrics.connect(DB_PATH)
     db.row_factory = sqlite3.Row
+    if not _schema_ready:
+        with _schema_lock:
+            if not _schema_ready:
+                init_db(db)
+                _schema_ready = True
     return db
 
-def init_db():
-    db = get_db()
+def init_db(db):
     c = db.cursor()
     
     # Create tables
@@ -54,10 +69,6 @@ def init_db():
                 )''')
     
     db.commit()
-    db.close()
-
-# Initialize database on import
-init_db()
 
 # Utils (same as original)
 def auto_split_options(question: str):
@@ -177,6 +188,12 @@ def create_poll():
 
 @app.route("/poll/<int:poll_id>", methods=["GET", "POST"])
 def poll_view(poll_id):
+    if request.method == "POST" and vote_limiter:
+        # Reject floods before touching SQLite; the single writer is the bottleneck.
+        throttled = vote_limiter.check(poll_id, get_device_hash(request), request.remote_addr)
+        if throttled:
+            return "Too many votes, please slow down.", 429, {"Retry-After": str(throttled[1])}
+
     db = get_db()
     c = db.cursor()
     c.execute("SELECT question, expiry, hide_results FROM polls WHERE id=?", (poll_id,))
@@ -225,14 +242,16 @@ def poll_view(poll_id):
             row = c.fetchone()
             insights_generated = row[0] if row else 0
             if not insights_generated:
-                results, total = poll_results(poll_id)
-                insight_text = generate_insights(poll_id, results, total)
-                if insight_text:
-                    c.execute("INSERT INTO insights (poll_id, insight_text) VALUES (?, ?)", (poll_id, insight_text))
-                    c.execute("UPDATE polls SET insights_generated=1 WHERE id=?", (poll_id,))
+                with metrics.INSIGHTS_SECONDS.time():
+                    results, total = poll_results(poll_id)
+                    insight_text = generate_insights(poll_id, results, total)
+                    if insight_text:
+                        c.execute("INSERT INTO insights (poll_id, insight_text) VALUES (?, ?)", (poll_id, insight_text))
+                        c.execute("UPDATE polls SET insights_generated=1 WHERE id=?", (poll_id,))
         
         db.commit()
         db.close()
+        metrics.VOTES.inc(str(poll_id))
         
         resp = make_response(redirect(url_for("results_view", poll_id=poll_id)))
         resp.set_cookie("vote_token", new_token, max_age=86400, httponly=True, samesite="Strict")
@@ -381,6 +400,7 @@ def creator_dashboard(poll_id, secret):
 
 @app.route("/qr/<int:poll_id>")
 def qr_code(poll_id):
+    import qrcode  # pulls in PIL, so only /qr pays for it
     link = url_for("poll_view", poll_id=poll_id, _external=True)
     img = qrcode.make(link)
     buf = io.BytesIO()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the serverless entry point (app_vercel.py).
+
+Every measurement runs in a fresh interpreter, the way a new serverless
+instance would: import the app, then serve one request through Flask's test
+client. For each route it reports the import time, the time to the first
+response and the total wall clock of the process, as medians over --runs.
+
+Usage:
+    python bench_coldstart.py [--runs 5] [--importtime]
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+CHILD = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import app_vercel
+t1 = time.perf_counter()
+client = app_vercel.app.test_client()
+method, path, form = sys.argv[1], sys.argv[2], json.loads(sys.argv[3])
+resp = client.open(path, method=method, data=form or None)
+t2 = time.perf_counter()
+print(json.dumps({"import": t1 - t0, "first_response": t2 - t1,
+                  "status": resp.status_code, "location": resp.headers.get("Location")}))
+"""
+
+
+def run_child(db_path, method, path, form=None):
+    env = dict(os.environ, POLL_DB=db_path)
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", CHILD, method, path, json.dumps(form or {})],
+                         cwd=HERE, env=env, capture_output=True, text=True, check=True)
+    wall = time.perf_counter() - start
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    result["process"] = wall
+    return result
+
+
+def create_fixture(db_path):
+    """Create one poll through the app itself and return (poll_id, secret, option_id)."""
+    form = {"question": "Cold start: tea vs coffee"}
+    res = run_child(db_path, "POST", "/", form)
+    poll_id = int(res["location"].split("/share/")[1].split("?")[0])
+    db = sqlite3.connect(db_path)
+    secret = db.execute("SELECT creator_secret FROM polls WHERE id=?", (poll_id,)).fetchone()[0]
+    option_id = db.execute("SELECT id FROM options WHERE poll_id=? ORDER BY id LIMIT 1", (poll_id,)).fetchone()[0]
+    db.close()
+    return poll_id, secret, option_id
+
+
+def print_importtime(top):
+    """Show the heaviest modules imported directly by app_vercel, per -X importtime."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app_vercel"],
+                         cwd=HERE, env=dict(os.environ, POLL_DB=os.devnull),
+                         capture_output=True, text=True)
+    # Children are printed before their parent, so collect direct children
+    # until the next top-level row and keep them only if that row is ours.
+    rows, pending = [], []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            pending.append((int(cumulative_us), name.strip()))
+        elif depth == 0:
+            if name.strip() == "app_vercel":
+                rows = pending
+            pending = []
+    rows.sort(reverse=True)
+    print("\nHeaviest imports made by app_vercel (cumulative, ms):")
+    for cumulative_us, name in rows[:top]:
+        print(f"   {cumulative_us / 1000:8.1f}  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes per route (default 5)")
+    parser.add_argument("--importtime", action="store_true", help="also print the heaviest imports")
+    parser.add_argument("--top", type=int, default=12, help="rows to show with --importtime")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "poll.db")
+        poll_id, secret, option_id = create_fixture(db_path)
+
+        routes = [
+            ("GET", "/", None),
+            ("POST", "/", {"question": "Pizza vs Burger"}),
+            ("GET", f"/poll/{poll_id}", None),
+            ("POST", f"/poll/{poll_id}", {"option": str(option_id)}),
+            ("GET", f"/results/{poll_id}", None),
+            ("GET", f"/api/results/{poll_id}", None),
+            ("GET", f"/share/{poll_id}", None),
+            ("GET", f"/creator/{poll_id}/{secret}", None),
+            ("GET", f"/qr/{poll_id}", None),
+        ]
+
+        print(f"🧊 Cold-start timings for app_vercel.py (median of {args.runs} fresh processes, ms)\n")
+        print(f"   {'route':<34} {'status':>6} {'import':>8} {'first resp':>11} {'process':>9}")
+        for method, path, form in routes:
+            samples = [run_child(db_path, method, path, form) for _ in range(args.runs)]
+            med = {k: statistics.median(s[k] for s in samples) * 1000
+                   for k in ("import", "first_response", "process")}
+            label = f"{method} {path.replace(secret, '<secret>')}"
+            print(f"   {label:<34} {samples[-1]['status']:>6} {med['import']:>8.1f} "
+                  f"{med['first_response']:>11.1f} {med['process']:>9.1f}")
+
+    if args.importtime:
+        print_importtime(args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""
+Load test for voting and live results.
+
+Starts app.py (Socket.IO) or app_vercel.py in-process on a throwaway database,
+or targets an already running server with --url, then drives it with
+concurrent voters, results pollers and Socket.IO viewers spread over one or
+more polls. Reports throughput and p50/p95/p99 latency per route, how long a
+writer had to wait for the SQLite lock, and how many vote_cast events reached
+the viewers.
+
+--idle-viewers opens that many extra Engine.IO long-poll connections from a
+single asyncio loop. They never fetch results, only answer pings and count
+vote_cast packets, so a serving mode can be checked for how many idle viewers
+it holds while votes keep flowing (raise `ulimit -n` for large counts).
+
+Results can be saved as a baseline and later runs compared against it, so a
+regression in poll_results() or the vote path fails the run.
+
+Usage:
+    python bench_load.py --app app --polls 1 --voters 16 --pollers 32 --viewers 8 --duration 15
+    python bench_load.py --app app_vercel --save-baseline baseline_vercel.json
+    python bench_load.py --app app --baseline baseline_app.json --tolerance 0.25
+    python bench_load.py --url http://localhost:5000 --db poll.db
+    python bench_load.py --url http://localhost:8000 --idle-viewers 5000 --viewers 0
+"""
+
+import argparse
+import asyncio
+import importlib
+import json
+import math
+import os
+import random
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+import requests
+
+OPTION_RE = re.compile(r'name="option"[^>]*value="(\d+)"')
+
+
+class Recorder:
+    """Collects latencies and status codes per route from many threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def add(self, route, seconds, status):
+        with self.lock:
+            self.latencies[route].append(seconds)
+            self.statuses[route][status] += 1
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    # nearest-rank
+    return sorted_values[max(0, math.ceil(pct / 100.0 * len(sorted_values)) - 1)]
+
+
+def start_server(module_name, db_path, rate_limit):
+    """Import the app against db_path and serve it from a background thread."""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    os.environ["POLL_DB"] = db_path
+    os.environ.setdefault("SOCKETIO_ASYNC_MODE", "threading")
+    # Every simulated voter shares 127.0.0.1, which the IP bucket would throttle.
+    os.environ["VOTE_RATE_LIMIT"] = "on" if rate_limit else "off"
+    module = importlib.import_module(module_name)
+    if module_name == "app":
+        module.init_db()
+        mode = module.socketio.async_mode
+        if mode != "threading":
+            print(f"⚠️  Socket.IO picked async_mode={mode!r}; in-process viewers need 'threading'. "
+                  f"Run under gunicorn and use --url instead.")
+    server = make_server("127.0.0.1", 0, module.app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def create_polls(base_url, count, options):
+    """Create polls through the public form and return {poll_id: [option_ids]}."""
+    polls = {}
+    session = requests.Session()
+    for i in range(count):
+        form = {"question": f"Load test poll {i + 1}", "num_options": str(options)}
+        form.update({f"option{n}": f"Option {n}" for n in range(1, options + 1)})
+        resp = session.post(f"{base_url}/", data=form, allow_redirects=False)
+        resp.raise_for_status()
+        poll_id = int(resp.headers["Location"].split("/share/")[1].split("?")[0])
+        page = requests.get(f"{base_url}/poll/{poll_id}").text
+        polls[poll_id] = [int(o) for o in OPTION_RE.findall(page)]
+    return polls
+
+
+def voter(base_url, polls, rec, stop, think):
+    poll_ids = list(polls)
+    while not stop.is_set():
+        poll_id = random.choice(poll_ids)
+        # Fresh session per vote: no vote_token cookie, so every POST is a new vote.
+        start = time.perf_counter()
+        try:
+            resp = requests.post(f"{base_url}/poll/{poll_id}",
+                                 data={"option": random.choice(polls[poll_id])},
+                                 headers={"User-Agent": f"bench-voter/{random.random()}"},
+                                 allow_redirects=False, timeout=30)
+            status = resp.status_code
+        except requests.RequestException:
+            status = "error"
+        rec.add("POST /poll/<id>", time.perf_counter() - start, status)
+        if think:
+            stop.wait(think)
+
+
+def poller(base_url, polls, rec, stop, interval):
+    session = requests.Session()
+    poll_id = random.choice(list(polls))
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            status = session.get(f"{base_url}/api/results/{poll_id}", timeout=30).status_code
+        except requests.RequestException:
+            status = "error"
+        rec.add("GET /api/results/<id>", time.perf_counter() - start, status)
+        if interval:
+            stop.wait(interval)
+
+
+def viewer(base_url, rec, stop, events):
+    import socketio
+
+    client = socketio.Client(reconnection=False)
+    client.on("vote_cast", lambda data: events.append(data["poll_id"]))
+    start = time.perf_counter()
+    try:
+        client.connect(base_url, transports=["polling"], wait_timeout=30)
+        status = 200
+    except Exception:
+        status = "error"
+    rec.add("socket connect", time.perf_counter() - start, status)
+    if status != 200:
+        return
+    stop.wait()
+    client.disconnect()
+
+
+async def _http(host, port, method, path, body=b""):
+    """One request on its own connection; returns (status, body)."""
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: {host}:{port}\r\nConnection: close\r\n"
+                 f"Content-Type: text/plain;charset=UTF-8\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    data = await reader.read()
+    writer.close()
+    head, _, payload = data.partition(b"\r\n\r\n")
+    if b"transfer-encoding: chunked" in head.lower():
+        decoded = b""
+        while payload:
+            size, _, rest = payload.partition(b"\r\n")
+            size = int(size.split(b";")[0], 16)
+            if not size:
+                break
+            decoded, payload = decoded + rest[:size], rest[size + 2:]
+        payload = decoded
+    return int(head.split(None, 2)[1]), payload
+
+
+async def idle_viewer(host, port, stats, gate):
+    """An Engine.IO polling client that only answers pings and counts vote_cast packets."""
+    path = "/socket.io/?EIO=4&transport=polling"
+    try:
+        async with gate:
+            _, payload = await _http(host, port, "GET", path)
+            path += "&sid=" + json.loads(payload[1:].split(b"\x1e")[0])["sid"]
+            await _http(host, port, "POST", path, b"40")
+        stats["connected"] += 1
+        while True:
+            status, payload = await _http(host, port, "GET", path)
+            if status != 200:
+                break
+            for packet in payload.split(b"\x1e"):
+                if packet == b"2":
+                    await _http(host, port, "POST", path, b"3")
+                elif packet.startswith(b'42["vote_cast"'):
+                    stats["events"] += 1
+    except (OSError, ValueError, IndexError, KeyError):
+        pass
+    stats["dropped"] += 1
+
+
+def idle_viewers(base_url, count, stop, ready, stats):
+    url = urlsplit(base_url)
+
+    async def main():
+        gate = asyncio.Semaphore(200)  # handshakes in flight at once
+        tasks = [asyncio.ensure_future(idle_viewer(url.hostname, url.port or 80, stats, gate))
+                 for _ in range(count)]
+        while not stop.is_set():
+            if stats["connected"] + stats["dropped"] >= count:
+                ready.set()
+            await asyncio.sleep(0.2)
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    asyncio.run(main())
+
+
+def lock_prober(db_path, stop, waits, interval):
+    """Measure how long a writer waits for SQLite's RESERVED lock under load."""
+    db = sqlite3.connect(db_path, timeout=60, isolation_level=None)
+    while not stop.is_set():
+        start = time.perf_counter()
+        db.execute("BEGIN IMMEDIATE")
+        waits.append(time.perf_counter() - start)
+        db.execute("ROLLBACK")
+        stop.wait(interval)
+    db.close()
+
+
+def summarize(rec, duration, lock_waits):
+    report = {"routes": {}, "lock_wait": None}
+    for route, values in sorted(rec.latencies.items()):
+        values.sort()
+        statuses = dict(rec.statuses[route])
+        errors = sum(n for s, n in statuses.items() if s == "error" or s >= 500)
+        report["routes"][route] = {
+            "count": len(values),
+            "rps": len(values) / duration,
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+            "errors": errors,
+            "statuses": {str(k): v for k, v in statuses.items()},
+        }
+    if lock_waits:
+        lock_waits.sort()
+        report["lock_wait"] = {
+            "samples": len(lock_waits),
+            "p50_ms": percentile(lock_waits, 50) * 1000,
+            "p99_ms": percentile(lock_waits, 99) * 1000,
+            "max_ms": lock_waits[-1] * 1000,
+        }
+    return report
+
+
+def print_report(report):
+    print(f"\n   {'route':<24} {'count':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for route, r in report["routes"].items():
+        print(f"   {route:<24} {r['count']:>7} {r['rps']:>8.1f} {r['p50_ms']:>8.1f} "
+              f"{r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['errors']:>7}")
+    lw = report["lock_wait"]
+    if lw:
+        print(f"\n   DB lock wait ({lw['samples']} probes): p50 {lw['p50_ms']:.2f} ms, "
+              f"p99 {lw['p99_ms']:.2f} ms, max {lw['max_ms']:.2f} ms")
+    if "idle" in report:
+        idle = report["idle"]
+        print(f"   Idle viewers: {idle['connected']}/{idle['requested']} connected, "
+              f"{idle['dropped']} dropped, {idle['events']} vote_cast packets received")
+    if "events" in report:
+        ev = report["events"]
+        print(f"   Socket.IO: {ev['received']} vote_cast events over {ev['viewers']} viewers "
+              f"({ev['per_viewer']:.1f} per viewer, {ev['votes']} votes cast)")
+
+
+def compare(report, baseline, tolerance):
+    """Return a list of regressions of report against baseline."""
+    problems = []
+    for route, base in baseline["routes"].items():
+        cur = report["routes"].get(route)
+        if not cur:
+            continue
+        for key in ("p95_ms", "p99_ms"):
+            if base[key] > 0 and cur[key] > base[key] * (1 + tolerance):
+                problems.append(f"{route} {key}: {base[key]:.1f} → {cur[key]:.1f}")
+        if route != "socket connect" and cur["rps"] < base["rps"] * (1 - tolerance):
+            problems.append(f"{route} req/s: {base['rps']:.1f} → {cur['rps']:.1f}")
+        if cur["errors"] > base["errors"]:
+            problems.append(f"{route} errors: {base['errors']} → {cur['errors']}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", choices=["app", "app_vercel"], default="app", help="app module to serve in-process")
+    parser.add_argument("--url", help="target a running server instead of serving in-process")
+    parser.add_argument("--db", help="database file of the --url server, enables the lock probe")
+    parser.add_argument("--polls", type=int, default=1)
+    parser.add_argument("--options", type=int, default=4, choices=[2, 3, 4])
+    parser.add_argument("--voters", type=int, default=8)
+    parser.add_argument("--pollers", type=int, default=16)
+    parser.add_argument("--viewers", type=int, default=4, help="Socket.IO clients (app.py only)")
+    parser.add_argument("--idle-viewers", type=int, default=0, help="extra idle long-poll Socket.IO clients")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of load")
+    parser.add_argument("--vote-think", type=float, default=0.0, help="pause between votes per voter")
+    parser.add_argument("--poll-interval", type=float, default=0.0, help="pause between results fetches")
+    parser.add_argument("--probe-interval", type=float, default=0.05)
+    parser.add_argument("--rate-limit", action="store_true", help="turn vote rate limiting on (in-process only)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save-baseline", metavar="FILE")
+    parser.add_argument("--baseline", metavar="FILE", help="compare against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    tmp = None
+    if args.url:
+        base_url, db_path, server = args.url.rstrip("/"), args.db, None
+    else:
+        tmp = tempfile.TemporaryDirectory()
+        db_path = os.path.join(tmp.name, "poll.db")
+        server, base_url = start_server(args.app, db_path, args.rate_limit)
+    viewers = args.viewers if (args.url or args.app == "app") else 0
+
+    polls = create_polls(base_url, args.polls, args.options)
+    print(f"🏋️  {base_url}: {len(polls)} poll(s), {args.voters} voters, {args.pollers} pollers, "
+          f"{viewers} viewers for {args.duration:.0f}s")
+
+    rec, stop, events, lock_waits = Recorder(), threading.Event(), [], []
+    threads = []
+    idle_stats = {"connected": 0, "dropped": 0, "events": 0}
+    if args.idle_viewers and (args.url or args.app == "app"):
+        ready = threading.Event()
+        threading.Thread(target=idle_viewers, args=(base_url, args.idle_viewers, stop, ready, idle_stats),
+                         daemon=True).start()
+        ready.wait(timeout=120)
+        print(f"   {idle_stats['connected']} idle viewers connected")
+    for _ in range(viewers):
+        threads.append(threading.Thread(target=viewer, args=(base_url, rec, stop, events)))
+    for _ in range(args.voters):
+        threads.append(threading.Thread(target=voter, args=(base_url, polls, rec, stop, args.vote_think)))
+    for _ in range(args.pollers):
+        threads.append(threading.Thread(target=poller, args=(base_url, polls, rec, stop, args.poll_interval)))
+    if db_path:
+        threads.append(threading.Thread(target=lock_prober, args=(db_path, stop, lock_waits, args.probe_interval)))
+
+    for t in threads:
+        t.daemon = True
+        t.start()
+    started = time.perf_counter()
+    time.sleep(args.duration)
+    stop.set()
+    elapsed = time.perf_counter() - started
+    for t in threads:
+        t.join(timeout=30)
+
+    report = summarize(rec, elapsed, lock_waits)
+    report["config"] = {k: v for k, v in vars(args).items() if k not in ("save_baseline", "baseline")}
+    if args.idle_viewers:
+        report["idle"] = dict(idle_stats, requested=args.idle_viewers)
+    if viewers:
+        votes = report["routes"].get("POST /poll/<id>", {}).get("statuses", {}).get("302", 0)
+        report["events"] = {"viewers": viewers, "received": len(events),
+                            "per_viewer": len(events) / viewers, "votes": votes}
+    print_report(report)
+
+    if server:
+        server.shutdown()
+    if tmp:
+        tmp.cleanup()
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Baseline saved to {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = compare(report, json.load(f), args.tolerance)
+        if problems:
+            print(f"\n❌ Regressions beyond {args.tolerance:.0%}:")
+            for p in problems:
+                print(f"   • {p}")
+            sys.exit(1)
+        print(f"\n✅ Within {args.tolerance:.0%} of baseline {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
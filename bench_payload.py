@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Bytes on the wire per live-results update and per page, by format and encoding.
+
+Creates a 2-option and a 4-option poll with some votes on a temporary
+database, then fetches /api/results/<id> in every format (full JSON, compact
+JSON, MessagePack) and Accept-Encoding (none, gzip, br), and the HTML pages
+with and without compression, through Flask's test client. Sizes are
+response bodies; headers are left out.
+
+Usage:
+    python bench_payload.py [--votes 30]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+POLLS = ("Tabs | Spaces", "Pineapple on pizza | No pineapple ever | Only on Fridays | Undecided")
+FORMATS = (("json", ""), ("compact", "?format=compact"), ("msgpack", "?format=msgpack"))
+ENCODINGS = (("identity", None), ("gzip", "gzip"), ("br", "br"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--votes", type=int, default=30, help="votes cast in each poll")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ.update(POLL_DB=os.path.join(tmp, "poll.db"), VOTE_RATE_LIMIT="off", EXPIRY_SCHEDULER="0")
+    sys.path.insert(0, HERE)
+    import app
+    app.init_db()
+    client = app.app.test_client()
+
+    def size(path, encoding):
+        return len(client.get(path, headers={"Accept-Encoding": encoding} if encoding else {}).data)
+
+    for question in POLLS:
+        resp = client.post("/", data={"question": question})
+        poll_id = int(resp.headers["Location"].split("/share/")[1].split("?")[0])
+        options = [r[0] for r in sqlite3.connect(app.DB).execute("SELECT id FROM options WHERE poll_id=?", (poll_id,))]
+        for i in range(args.votes):
+            client.post(f"/poll/{poll_id}", data={"option": options[i % len(options)]},
+                        headers={"User-Agent": f"bench-{i}"})
+            client.delete_cookie("vote_token")
+
+        print(f"\n📦 {len(options)} options, {args.votes} votes: bytes per /api/results update")
+        print(f"   {'format':<10}" + "".join(f"{name:>10}" for name, _ in ENCODINGS))
+        baseline = size(f"/api/results/{poll_id}", None)
+        for fmt, query in FORMATS:
+            # Bodies under compress.MIN_SIZE, and MessagePack, are sent as is.
+            cells = [size(f"/api/results/{poll_id}{query}", encoding) for _, encoding in ENCODINGS]
+            print(f"   {fmt:<10}" + "".join(f"{n:>10}" for n in cells))
+        compact = size(f"/api/results/{poll_id}?format=compact", None)
+        print(f"   live pages now fetch compact: {baseline} -> {compact} bytes per update "
+              f"({100 - compact * 100 // baseline}% less)")
+
+        print("   page bytes (identity / gzip / br):")
+        for path in (f"/poll/{poll_id}", f"/results/{poll_id}", "/"):
+            sizes = [size(path, encoding) for _, encoding in ENCODINGS]
+            print(f"     {path:<14} {sizes[0]:>7} {sizes[1]:>7} {sizes[2]:>7}")
+
+
+if __name__ == "__main__":
+    main()
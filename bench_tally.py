@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Single hot poll: SQLite-only tallies vs the in-memory tally engine.
+
+Each mode runs app.py in a fresh process (TALLY_ENGINE is read at import) on
+a temporary database holding one poll preloaded with --preload votes, then
+times --votes vote POSTs and --reads /api/results fetches through Flask's test
+client, so the numbers reflect app and database work without network noise.
+
+Usage:
+    python bench_tally.py [--preload 50000] [--votes 2000] [--reads 5000]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+CHILD = r"""
+import json, sqlite3, sys, time
+preload, votes, reads = map(int, sys.argv[1:4])
+import app
+app.init_db()
+client = app.app.test_client(use_cookies=False)
+resp = client.post("/", data={"question": "Hot poll: red | green | blue | yellow"})
+poll_id = int(resp.headers["Location"].split("/share/")[1].split("?")[0])
+db = sqlite3.connect(app.DB)
+options = [r[0] for r in db.execute("SELECT id FROM options WHERE poll_id=?", (poll_id,))]
+db.executemany("INSERT INTO votes (poll_id, option_id, vote_token) VALUES (?, ?, 'preload')",
+               ((poll_id, options[i % len(options)]) for i in range(preload)))
+db.commit()
+db.close()
+
+start = time.perf_counter()
+for i in range(votes):
+    r = client.post(f"/poll/{poll_id}", data={"option": options[i % len(options)]})
+    assert r.status_code == 302, r.status_code
+vote_secs = time.perf_counter() - start
+
+start = time.perf_counter()
+for _ in range(reads):
+    r = client.get(f"/api/results/{poll_id}")
+read_secs = time.perf_counter() - start
+assert r.get_json()["total_votes"] == preload + votes, r.get_json()
+print(json.dumps({"votes_per_sec": votes / vote_secs, "reads_per_sec": reads / read_secs}))
+"""
+
+
+def run(mode_env, preload, votes, reads):
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, POLL_DB=os.path.join(tmp, "poll.db"), VOTE_RATE_LIMIT="off", **mode_env)
+        out = subprocess.run([sys.executable, "-c", CHILD, str(preload), str(votes), str(reads)],
+                             cwd=HERE, env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--preload", type=int, default=50000, help="votes already in the poll")
+    parser.add_argument("--votes", type=int, default=2000)
+    parser.add_argument("--reads", type=int, default=5000)
+    args = parser.parse_args()
+
+    print(f"🔥 One hot poll, {args.preload} existing votes: {args.votes} votes, {args.reads} results reads\n")
+    sqlite_only = run({"TALLY_ENGINE": "0"}, args.preload, args.votes, args.reads)
+    engine = run({"TALLY_ENGINE": "1"}, args.preload, args.votes, args.reads)
+    print(f"   {'mode':<14} {'votes/s':>10} {'reads/s':>10}")
+    for name, r in (("sqlite only", sqlite_only), ("tally engine", engine)):
+        print(f"   {name:<14} {r['votes_per_sec']:>10.0f} {r['reads_per_sec']:>10.0f}")
+    print(f"\n   speedup: votes ×{engine['votes_per_sec'] / sqlite_only['votes_per_sec']:.1f}, "
+          f"reads ×{engine['reads_per_sec'] / sqlite_only['reads_per_sec']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Response compression for HTML and JSON.
+
+Responses of a compressible type and at least MIN_SIZE bytes are sent with
+brotli when the client accepts it and the `brotli` package is installed,
+otherwise gzip. Streamed responses (vote exports) are left alone.
+
+A view can mark its response as never changing again by setting
+g.precompressed_key; the compressed bytes are then kept per key and encoding
+(up to PRECOMPRESSED_MAX entries) and reused instead of compressing again.
+/api/results does this for polls that have closed.
+"""
+
+import gzip
+
+from flask import g, request
+
+import metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = ("text/html", "text/plain", "text/css", "application/json",
+                "application/javascript", "application/vnd.pollapp.compact+json")
+# Below this, gzip's 18-byte header and trailer eat most of the saving.
+MIN_SIZE = 100
+PRECOMPRESSED_MAX = 10000
+
+BYTES_SENT = metrics.Counter("pollapp_response_bytes_total",
+                             "Response body bytes sent, by endpoint and content encoding.",
+                             ("endpoint", "encoding"))
+
+_precompressed = {}
+
+
+def negotiate(accept_encoding):
+    """The encoding to use for an Accept-Encoding header value: 'br', 'gzip' or None."""
+    accepted = {}
+    for item in (accept_encoding or "").split(","):
+        name, _, params = item.strip().partition(";")
+        q = params.strip()[2:] if params.strip().startswith("q=") else "1"
+        try:
+            accepted[name.strip().lower()] = float(q)
+        except ValueError:
+            continue
+    for encoding in ("br", "gzip"):
+        if encoding == "br" and brotli is None:
+            continue
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+
+def encode(body, accept_encoding, key=None):
+    """(body, content_encoding) for a client's Accept-Encoding; content_encoding is None if sent as is.
+
+    With a key, the compressed bytes are cached under (key, encoding)."""
+    encoding = negotiate(accept_encoding)
+    if encoding is None or len(body) < MIN_SIZE:
+        return body, None
+    if key is None:
+        return compress(body, encoding), encoding
+    cached = _precompressed.get((key, encoding))
+    if cached is None:
+        metrics.cache_miss("precompressed")
+        if len(_precompressed) >= PRECOMPRESSED_MAX:
+            del _precompressed[next(iter(_precompressed))]
+        cached = _precompressed[(key, encoding)] = compress(body, encoding)
+    else:
+        metrics.cache_hit("precompressed")
+    return cached, encoding
+
+
+def init_app(app):
+    @app.after_request
+    def _compress(response):
+        endpoint = request.endpoint or "unknown"
+        if (response.direct_passthrough or response.is_streamed or response.status_code != 200
+                or "Content-Encoding" in response.headers or response.mimetype not in COMPRESSIBLE):
+            if not response.is_streamed:
+                BYTES_SENT.inc(endpoint, "identity", amount=response.content_length or 0)
+            return response
+        response.vary.add("Accept-Encoding")
+        body, encoding = encode(response.get_data(), request.headers.get("Accept-Encoding"),
+                                g.get("precompressed_key"))
+        if encoding:
+            response.set_data(body)
+            response.headers["Content-Encoding"] = encoding
+        BYTES_SENT.inc(endpoint, encoding or "identity", amount=len(body))
+        return response
@@ -0,0 +1,36 @@
+import os
+import tempfile
+
+import pytest
+
+# app.py reads its configuration at import time; keep it off the checked-in
+# poll.db and without the background expiry thread.
+os.environ.setdefault("POLL_DB", os.path.join(tempfile.mkdtemp(), "poll.db"))
+os.environ.setdefault("EXPIRY_SCHEDULER", "0")
+
+import app as pollapp  # noqa: E402
+
+# Scripts that drive an already running server (python test_app.py <url>).
+collect_ignore = ["test_app.py", "test_deployment.py"]
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """A fresh database for one test; the schema is created on first use."""
+    path = str(tmp_path / "poll.db")
+    monkeypatch.setattr(pollapp, "DB", path)
+    monkeypatch.setattr(pollapp, "_schema_ready", False)
+    monkeypatch.setattr(pollapp, "frozen_results", {})
+    return path
+
+
+@pytest.fixture
+def client(db_path):
+    return pollapp.app.test_client()
+
+
+def create_poll(client, question="Tea | Coffee | Water"):
+    """POST / and return (poll_id, creator_secret) from the share redirect."""
+    location = client.post("/", data={"question": question}).headers["Location"]
+    poll_id, _, secret = location.split("/share/")[1].partition("?secret=")
+    return int(poll_id), secret
@@ -0,0 +1,78 @@
+"""
+Timer wheel for poll expiries.
+
+Instead of each request comparing `expiry` with the clock, open polls are
+scheduled on a hashed timer wheel: a ring of `slots` buckets, each covering
+`tick` seconds. A poll lands in the bucket for its deadline tick (modulo the
+ring size), so scheduling and cancelling are dict operations and advancing
+the clock only looks at the buckets the clock has passed. Deadlines more than
+one turn away share a bucket with nearer ones and are left there until their
+own tick comes round.
+
+The wheel only decides *when*; app.py closes the polls advance() returns.
+"""
+
+import math
+import threading
+
+import metrics
+
+CLOSED = metrics.Counter("pollapp_polls_closed_total", "Polls closed by the expiry scheduler.")
+SCHEDULED = metrics.Gauge("pollapp_polls_scheduled", "Open polls waiting on the expiry scheduler.")
+
+
+class TimerWheel:
+    def __init__(self, tick=1.0, slots=3600):
+        self.tick = tick
+        self._slots = [{} for _ in range(slots)]  # per bucket: key -> deadline tick
+        self._where = {}  # key -> bucket index
+        self._lock = threading.Lock()
+        self._now = None  # last tick advance() processed
+
+    def __len__(self):
+        return len(self._where)
+
+    def __contains__(self, key):
+        return key in self._where
+
+    def schedule(self, key, when):
+        """Fire key at unix time `when` (or at the next advance if that is past)."""
+        deadline = math.ceil(when / self.tick)
+        with self._lock:
+            self._remove(key)
+            if self._now is not None:
+                deadline = max(deadline, self._now + 1)
+            slot = deadline % len(self._slots)
+            self._slots[slot][key] = deadline
+            self._where[key] = slot
+            SCHEDULED.set(len(self._where))
+
+    def cancel(self, key):
+        with self._lock:
+            self._remove(key)
+            SCHEDULED.set(len(self._where))
+
+    def _remove(self, key):
+        slot = self._where.pop(key, None)
+        if slot is not None:
+            del self._slots[slot][key]
+
+    def advance(self, now):
+        """Move the clock to unix time `now`; return the keys that are due."""
+        now_tick = math.floor(now / self.tick)
+        with self._lock:
+            start = now_tick if self._now is None else self._now + 1
+            # Past one full turn every bucket has been reached; visit each once.
+            ticks = range(max(start, now_tick - len(self._slots) + 1), now_tick + 1)
+            # The first advance also sweeps every bucket for deadlines already past.
+            slots = range(len(self._slots)) if self._now is None else (t % len(self._slots) for t in ticks)
+            due = []
+            for slot in slots:
+                bucket = self._slots[slot]
+                for key in [k for k, deadline in bucket.items() if deadline <= now_tick]:
+                    del bucket[key]
+                    del self._where[key]
+                    due.append(key)
+            self._now = now_tick
+            SCHEDULED.set(len(self._where))
+        return due
@@ -0,0 +1,247 @@
+"""
+Prometheus-style metrics for the polling app.
+
+Counters, gauges and fixed-bucket histograms live in process memory and are
+rendered in the Prometheus text exposition format at /metrics. An update is a
+dict lookup plus a few additions under a lock, so instrumenting the vote path
+costs microseconds. Values are per process; scrape each worker separately.
+"""
+
+import bisect
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, has_request_context, request
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SQL_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5)
+
+REGISTRY = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), max_series=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # With max_series, the least recently updated series is dropped to
+        # make room for a new one (Prometheus sees that as a counter reset).
+        self.max_series = max_series
+        self._lock = threading.Lock()
+        self._values = {}
+        REGISTRY.append(self)
+
+    def remove(self, *labels):
+        """Drop one series, e.g. when the thing it is labelled with goes away."""
+        with self._lock:
+            self._values.pop(labels, None)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            if self.max_series is None:
+                self._values[labels] = self._values.get(labels, 0) + amount
+                return
+            # Re-insert so the dict stays in least recently updated order.
+            value = self._values.pop(labels, 0) + amount
+            if len(self._values) >= self.max_series:
+                del self._values[next(iter(self._values))]
+            self._values[labels] = value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # per-bucket (non-cumulative) counts + overflow, then sum
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][i] += 1
+            state[1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1])) for k, v in self._values.items())
+        for labels, (counts, total) in items:
+            running = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                running += n
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, [le])} {running}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {running}")
+        return lines
+
+
+REQUEST_SECONDS = Histogram("pollapp_request_duration_seconds",
+                            "Request latency by endpoint.", ("endpoint", "method"))
+REQUESTS = Counter("pollapp_requests_total", "Requests by endpoint and status.",
+                   ("endpoint", "method", "status"))
+SQL_SECONDS = Histogram("pollapp_sql_query_duration_seconds",
+                        "SQL statement duration by endpoint and statement type.",
+                        ("endpoint", "statement"), buckets=SQL_BUCKETS)
+# One series per poll: removed when a poll closes, and at most the 1000
+# most recently voted-on polls are kept.
+VOTES = Counter("pollapp_votes_total", "Votes accepted per poll; use rate() for votes/sec.", ("poll_id",),
+                max_series=1000)
+SOCKET_CONNECTIONS = Gauge("pollapp_socketio_connections", "Currently connected Socket.IO clients.")
+SOCKET_EMIT_SECONDS = Histogram("pollapp_socketio_emit_duration_seconds",
+                                "Time spent in socketio.emit by event.", ("event",))
+CACHE_REQUESTS = Counter("pollapp_cache_requests_total", "Cache lookups by cache and result (hit/miss).",
+                         ("cache", "result"))
+INSIGHTS_SECONDS = Histogram("pollapp_insights_generation_seconds",
+                             "Time to compute and store insights for a poll.")
+EXPORT_ROWS = Counter("pollapp_export_rows_total", "Vote rows streamed by creator exports, by format.",
+                      ("format",))
+
+
+def cache_hit(cache):
+    CACHE_REQUESTS.inc(cache, "hit")
+
+
+def cache_miss(cache):
+    CACHE_REQUESTS.inc(cache, "miss")
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ---------------- SQL timing -------------
+
+# Callables invoked as listener(sql, parameters, elapsed, connection) after
+# every statement on an instrumented connection; see sqltrace.py.
+SQL_LISTENERS = []
+
+
+def _current_endpoint():
+    if has_request_context():
+        return request.endpoint or "unknown"
+    return "none"
+
+
+def _observe_sql(sql, parameters, elapsed, connection):
+    statement = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else "?"
+    SQL_SECONDS.observe(elapsed, _current_endpoint(), statement)
+    for listener in SQL_LISTENERS:
+        listener(sql, parameters, elapsed, connection)
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _observe_sql(sql, parameters, time.perf_counter() - start, self.connection)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _observe_sql(sql, None, time.perf_counter() - start, self.connection)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        start = time.perf_counter()
+        try:
+            super().commit()
+        finally:
+            _observe_sql("COMMIT", None, time.perf_counter() - start, self)
+
+
+def connect(path, **kwargs):
+    """sqlite3.connect() returning a connection whose statements are timed."""
+    return sqlite3.connect(path, factory=InstrumentedConnection, **kwargs)
+
+
+# ---------------- Flask wiring -------------
+
+def init_app(app):
+    """Time every request and serve the registry at /metrics."""
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        start = g.pop("_metrics_start", None)
+        if start is not None:
+            endpoint = request.endpoint or "unknown"
+            REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint, request.method)
+            REQUESTS.inc(endpoint, request.method, str(response.status_code))
+        return response
+
+    @app.route("/metrics")
+    def metrics():
+        return Response(render(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,144 @@
+"""
+Token-bucket rate limiting for the vote path.
+
+Buckets are kept per key in process memory by default. Set
+RATELIMIT_REDIS_URL to share them between workers through Redis (needs the
+`redis` package). Limits are configured per scope as "<votes>/<seconds>":
+
+    VOTE_LIMIT_DEVICE  per device hash (User-Agent + IP)   default 5/60
+    VOTE_LIMIT_IP      per client IP                       default 120/60
+    VOTE_LIMIT_POLL    per poll, across all voters         default 200/1
+
+The count is also the burst size. Set a scope to "off" to disable it.
+
+Vote limiting is off unless VOTE_RATE_LIMIT=on. The device hash and the IP
+are shared by everyone behind one NAT on the same browser, which is exactly
+what a live-event audience on venue Wi-Fi looks like, so before turning it
+on for such events raise VOTE_LIMIT_DEVICE and VOTE_LIMIT_IP (or set them
+to "off" and rely on VOTE_LIMIT_POLL). If Redis is unreachable, votes are
+let through rather than failed.
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+
+import metrics
+
+THROTTLED = metrics.Counter("pollapp_votes_throttled_total",
+                            "Vote attempts rejected by the rate limiter, by scope.", ("scope",))
+ERRORS = metrics.Counter("pollapp_ratelimit_errors_total",
+                         "Rate limit checks skipped because the bucket store failed.")
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMITS = {"device": "5/60", "ip": "120/60", "poll": "200/1"}
+
+
+def parse_limit(spec):
+    """'5/60' -> (rate per second, burst); 'off' or '' -> None."""
+    if not spec or spec.strip().lower() in ("off", "0", "none"):
+        return None
+    count, _, seconds = spec.partition("/")
+    count, seconds = float(count), float(seconds or 1)
+    return count / seconds, count
+
+
+class MemoryBuckets:
+    """Token buckets in a dict, for a single process."""
+
+    def __init__(self, max_keys=100_000, clock=time.monotonic):
+        self.max_keys = max_keys
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def take(self, key, rate, burst, cost=1):
+        """Take cost tokens from key's bucket. Returns seconds to wait, 0 if allowed."""
+        now = self._clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_keys:
+                    self._prune(now)
+                tokens = burst
+            else:
+                tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            wait = 0 if tokens >= cost else (cost - tokens) / rate
+            if not wait:
+                tokens -= cost
+            # [tokens, last update, time at which the bucket is full again]
+            self._buckets[key] = [tokens, now, now + (burst - tokens) / rate]
+            return wait
+
+    def _prune(self, now):
+        # Buckets that have refilled completely carry no state; drop those
+        # first, then the least recently touched half if that was not enough.
+        full = [k for k, bucket in self._buckets.items() if bucket[2] <= now]
+        for k in full:
+            del self._buckets[k]
+        if len(self._buckets) >= self.max_keys:
+            by_age = sorted(self._buckets, key=lambda k: self._buckets[k][1])
+            for k in by_age[:len(by_age) // 2]:
+                del self._buckets[k]
+
+
+class RedisBuckets:
+    """Token buckets in Redis, shared by every worker pointing at the same server."""
+
+    SCRIPT = """
+    local rate, burst, now, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+    local b = redis.call('HMGET', KEYS[1], 't', 's')
+    local tokens = tonumber(b[1]) or burst
+    local stamp = tonumber(b[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - stamp) * rate)
+    local wait = 0
+    if tokens >= cost then tokens = tokens - cost else wait = (cost - tokens) / rate end
+    redis.call('HSET', KEYS[1], 't', tokens, 's', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+    return tostring(wait)
+    """
+
+    def __init__(self, url, prefix="pollapp:rl:"):
+        import redis
+        self.prefix = prefix
+        self._errors = redis.RedisError
+        self._take = redis.Redis.from_url(url).register_script(self.SCRIPT)
+
+    def take(self, key, rate, burst, cost=1):
+        try:
+            return float(self._take(keys=[self.prefix + key], args=[rate, burst, time.time(), cost]))
+        except self._errors as e:
+            # Fail open: an unreachable limiter must not turn every vote into a 500.
+            ERRORS.inc()
+            logger.warning("Vote rate limit skipped, Redis unavailable: %s", e)
+            return 0
+
+
+class VoteLimiter:
+    """Checks a vote attempt against the device, IP and poll buckets, in that order."""
+
+    def __init__(self, buckets, limits):
+        self.buckets = buckets
+        self.limits = [(scope, limit) for scope, limit in limits.items() if limit]
+
+    @classmethod
+    def from_env(cls):
+        if os.environ.get('VOTE_RATE_LIMIT', '').lower() not in ('on', '1'):
+            return None
+        limits = {scope: parse_limit(os.environ.get(f'VOTE_LIMIT_{scope.upper()}', default))
+                  for scope, default in DEFAULT_LIMITS.items()}
+        url = os.environ.get('RATELIMIT_REDIS_URL')
+        return cls(RedisBuckets(url) if url else MemoryBuckets(), limits)
+
+    def check(self, poll_id, device_hash, ip):
+        """Return (scope, retry_after) for the first exhausted bucket, or None if allowed."""
+        keys = {"device": device_hash, "ip": ip or "", "poll": str(poll_id)}
+        for scope, (rate, burst) in self.limits:
+            wait = self.buckets.take(f"{scope}:{keys[scope]}", rate, burst)
+            if wait:
+                THROTTLED.inc(scope)
+                return scope, max(1, math.ceil(wait))
+        return None
@@ -0,0 +1,79 @@
+"""
+Opt-in SQL tracing for connections opened through metrics.connect().
+
+Enable with SQL_TRACE=1. Every statement is logged at DEBUG with its duration
+and the route that issued it, statements slower than SQL_SLOW_MS (default 50)
+are logged as warnings, and with SQL_EXPLAIN=1 the warning includes the
+statement's EXPLAIN QUERY PLAN. Each request logs a one-line summary, and in
+debug mode the same summary is returned in an X-SQL-Summary header.
+"""
+
+import logging
+import os
+import sqlite3
+
+from flask import g, has_app_context, has_request_context, request
+
+import metrics
+
+EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+
+def _route():
+    if has_request_context():
+        return f"{request.method} {request.path} ({request.endpoint or 'unknown'})"
+    return "outside request"
+
+
+def explain(connection, sql, parameters):
+    """Return the EXPLAIN QUERY PLAN rows for sql as indented text."""
+    # Call the base class so the plan lookup itself is not traced.
+    rows = sqlite3.Connection.execute(connection, "EXPLAIN QUERY PLAN " + sql, parameters or ()).fetchall()
+    depth = {0: 0}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, 0) + 1
+        lines.append("  " * depth[node_id] + detail)
+    return "\n".join(lines)
+
+
+def init_app(app):
+    app.config.setdefault('SQL_TRACE', os.environ.get('SQL_TRACE') == '1')
+    app.config.setdefault('SQL_SLOW_MS', float(os.environ.get('SQL_SLOW_MS', '50')))
+    app.config.setdefault('SQL_EXPLAIN', os.environ.get('SQL_EXPLAIN') == '1')
+    if not app.config['SQL_TRACE']:
+        return
+
+    logger = app.logger
+    if logger.level == logging.NOTSET:
+        logger.setLevel(logging.DEBUG)
+    slow_ms = app.config['SQL_SLOW_MS']
+
+    def trace(sql, parameters, elapsed, connection):
+        ms = elapsed * 1000
+        if has_app_context():
+            g.setdefault('_sql_trace', []).append(ms)
+        statement = " ".join(sql.split())
+        if ms < slow_ms:
+            logger.debug("sql %.2f ms [%s] %s %r", ms, _route(), statement, parameters)
+            return
+        plan = ""
+        if app.config['SQL_EXPLAIN'] and sql.lstrip()[:6].upper().startswith(EXPLAINABLE):
+            try:
+                plan = explain(connection, sql, parameters)
+            except sqlite3.Error as e:
+                plan = f"(query plan unavailable: {e})"
+        logger.warning("slow sql %.2f ms [%s] %s %r%s", ms, _route(), statement, parameters,
+                       "\n" + plan if plan else "")
+
+    metrics.SQL_LISTENERS.append(trace)
+
+    @app.after_request
+    def _sql_summary(response):
+        timings = g.pop('_sql_trace', None)
+        if timings:
+            summary = f"{len(timings)} queries; {sum(timings):.2f} ms total; slowest {max(timings):.2f} ms"
+            logger.info("sql summary [%s] %s", _route(), summary)
+            if app.debug:
+                response.headers['X-SQL-Summary'] = summary
+        return response
@@ -0,0 +1,172 @@
+"""
+In-memory vote tallies for hot polls.
+
+With TALLY_ENGINE=1, poll_results() and the vote path read and bump per-poll
+counters held in memory instead of running a COUNT(*) per option on every
+request. Each loaded poll keeps its option ids, texts and an array of counts
+(one machine word per option).
+
+The `tallies` table sits next to the votes it summarises (the main database,
+or the poll's vote shard) and is a checkpoint: per-option counts covering every vote up
+to `last_vote_id`. A checkpoint is computed from the votes table itself (old
+checkpoint + votes with a higher id), so it is always consistent regardless of
+what is in memory. Loading a poll, including after a crash or restart, is the
+checkpoint plus that tail of raw votes rows.
+
+Counts live in one process, so this assumes a single worker (as the Procfile
+runs). Every TALLY_CHECKPOINT_SECONDS (default 30) each poll in memory is
+checkpointed; polls that have expired get that final checkpoint and are then
+evicted. At most TALLY_MAX_POLLS (default 10000) polls are kept, least
+recently used first out.
+"""
+
+import datetime
+import threading
+import time
+from array import array
+
+import metrics
+
+SCHEMA = '''CREATE TABLE IF NOT EXISTS tallies (
+                poll_id INTEGER NOT NULL,
+                option_id INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                last_vote_id INTEGER NOT NULL,
+                PRIMARY KEY (poll_id, option_id)
+            )'''
+
+
+class PollTally:
+    __slots__ = ("option_ids", "texts", "index", "counts", "watermark", "expiry", "touched")
+
+    def __init__(self, options, expiry):
+        self.option_ids = tuple(row[0] for row in options)
+        self.texts = tuple(row[1] for row in options)
+        self.index = {oid: i for i, oid in enumerate(self.option_ids)}
+        self.counts = array("q", bytes(8 * len(self.option_ids)))
+        # Every vote with id <= watermark is already in counts.
+        self.watermark = 0
+        self.expiry = expiry
+        self.touched = time.monotonic()
+
+
+def read_checkpoint(db, poll_id):
+    """Return ({option_id: count}, last_vote_id) from the stored checkpoint."""
+    rows = db.execute("SELECT option_id, count, last_vote_id FROM tallies WHERE poll_id=?", (poll_id,)).fetchall()
+    counts = {row[0]: row[1] for row in rows}
+    return counts, min((row[2] for row in rows), default=0)
+
+
+def read_tail(db, poll_id, after_id):
+    """Return ({option_id: count}, max_vote_id) for votes newer than after_id."""
+    rows = db.execute("""SELECT option_id, COUNT(*), MAX(id) FROM votes
+                         WHERE id > ? AND poll_id = ? GROUP BY option_id""", (after_id, poll_id)).fetchall()
+    return {row[0]: row[1] for row in rows}, max((row[2] for row in rows), default=after_id)
+
+
+def checkpoint(db, vote_db, poll_id):
+    """Fold votes newer than the stored checkpoint into it. Commits vote_db."""
+    counts, last_id = read_checkpoint(vote_db, poll_id)
+    tail, new_last_id = read_tail(vote_db, poll_id, last_id)
+    if not tail and counts:
+        return
+    option_ids = [row[0] for row in db.execute("SELECT id FROM options WHERE poll_id=?", (poll_id,))]
+    vote_db.executemany("INSERT OR REPLACE INTO tallies (poll_id, option_id, count, last_vote_id) VALUES (?, ?, ?, ?)",
+                        [(poll_id, oid, counts.get(oid, 0) + tail.get(oid, 0), new_last_id) for oid in option_ids])
+    vote_db.commit()
+
+
+def load_counts(vote_db, poll_ids):
+    """{poll_id: {option_id: count}} for many polls in two queries: their
+    checkpoints, then the votes newer than each poll's checkpoint."""
+    if not poll_ids:
+        return {}
+    marks = ",".join("?" * len(poll_ids))
+    counts = {poll_id: {} for poll_id in poll_ids}
+    watermarks = {}
+    for poll_id, option_id, count, last_id in vote_db.execute(
+            f"SELECT poll_id, option_id, count, last_vote_id FROM tallies WHERE poll_id IN ({marks})", poll_ids):
+        counts[poll_id][option_id] = count
+        watermarks[poll_id] = min(last_id, watermarks.get(poll_id, last_id))
+    # One (poll_id, after_id) pair per poll; each is a seek on the votes
+    # (poll_id) index, which is ordered by id within a poll.
+    pairs = [(poll_id, watermarks.get(poll_id, 0)) for poll_id in poll_ids]
+    values = ", ".join(["(?, ?)"] * len(pairs))
+    tail = vote_db.execute(f"""WITH page(poll_id, after_id) AS (VALUES {values})
+                               SELECT v.poll_id, v.option_id, COUNT(*) FROM page
+                               JOIN votes v ON v.poll_id = page.poll_id AND v.id > page.after_id
+                               GROUP BY v.poll_id, v.option_id""", [x for pair in pairs for x in pair])
+    for poll_id, option_id, count in tail:
+        counts[poll_id][option_id] = counts[poll_id].get(option_id, 0) + count
+    return counts
+
+
+class TallyEngine:
+    def __init__(self, max_polls=10000):
+        self.max_polls = max_polls
+        self._lock = threading.Lock()
+        self._polls = {}
+
+    def _load(self, db, vote_db, poll_id):
+        row = db.execute("SELECT expiry FROM polls WHERE id=?", (poll_id,)).fetchone()
+        options = db.execute("SELECT id, text FROM options WHERE poll_id=? ORDER BY id", (poll_id,)).fetchall()
+        if not row or not options:
+            return None
+        tally = PollTally(options, datetime.datetime.fromisoformat(row[0]))
+        counts, last_id = read_checkpoint(vote_db, poll_id)
+        tail, tally.watermark = read_tail(vote_db, poll_id, last_id)
+        for oid, i in tally.index.items():
+            tally.counts[i] = counts.get(oid, 0) + tail.get(oid, 0)
+        if len(self._polls) >= self.max_polls:
+            coldest = min(self._polls, key=lambda pid: self._polls[pid].touched)
+            del self._polls[coldest]
+        self._polls[poll_id] = tally
+        return tally
+
+    def _get(self, db, vote_db, poll_id):
+        tally = self._polls.get(poll_id)
+        if tally is None:
+            metrics.cache_miss("tally")
+            tally = self._load(db, vote_db, poll_id)
+        else:
+            metrics.cache_hit("tally")
+        if tally is not None:
+            tally.touched = time.monotonic()
+        return tally
+
+    def results(self, db, vote_db, poll_id):
+        """Same shape as poll_results(): ([(text, count, option_id, pct), ...], total)."""
+        with self._lock:
+            tally = self._get(db, vote_db, poll_id)
+            if tally is None:
+                return [], 0
+            counts = tally.counts.tolist()
+        total = sum(counts)
+        return [(t, c, oid, round(c * 100.0 / total, 1) if total else 0.0)
+                for t, c, oid in zip(tally.texts, counts, tally.option_ids)], total
+
+    def record_vote(self, db, vote_db, poll_id, option_id, vote_id):
+        """Count a committed vote and return the poll's new total."""
+        with self._lock:
+            tally = self._get(db, vote_db, poll_id)
+            if tally is None:
+                return 0
+            # A poll loaded after this vote committed already includes it.
+            if vote_id > tally.watermark:
+                tally.counts[tally.index[option_id]] += 1
+            return sum(tally.counts)
+
+    def checkpoint_all(self, db, vote_db_for):
+        """Checkpoint every poll in memory; expired polls are evicted afterwards.
+
+        vote_db_for(poll_id) returns the connection holding that poll's votes.
+        """
+        now = datetime.datetime.now()
+        with self._lock:
+            loaded = [(pid, t.expiry) for pid, t in self._polls.items()]
+        for poll_id, expiry in loaded:
+            checkpoint(db, vote_db_for(poll_id), poll_id)
+            if now > expiry:
+                with self._lock:
+                    self._polls.pop(poll_id, None)
+        return len(loaded)
@@ -0,0 +1,84 @@
+import json
+import sqlite3
+import uuid
+
+import pytest
+
+import app as pollapp
+from conftest import create_poll
+
+
+def poll_count(db_path):
+    return sqlite3.connect(db_path).execute("SELECT COUNT(*) FROM polls").fetchone()[0]
+
+
+def test_bulk_assigns_ids_after_existing_polls(client, db_path):
+    existing, _ = create_poll(client)
+    resp = client.post("/api/polls/bulk", json={"polls": [
+        {"question": "Tabs | Spaces"},
+        {"question": "Best editor?", "options": ["vim", "emacs", " "], "hide_results": True},
+        {"question": "Red | Green | Blue"},
+    ]})
+    assert resp.status_code == 201
+    body = resp.get_json()
+    ids = [poll["id"] for poll in body["polls"]]
+    assert ids == [existing + 1, existing + 2, existing + 3]
+
+    db = sqlite3.connect(db_path)
+    options = db.execute("SELECT poll_id, text FROM options WHERE poll_id > ? ORDER BY id", (existing,)).fetchall()
+    assert options == [(ids[0], "Tabs"), (ids[0], "Spaces"), (ids[1], "vim"), (ids[1], "emacs"),
+                       (ids[2], "Red"), (ids[2], "Green"), (ids[2], "Blue")]
+    assert db.execute("SELECT hide_results FROM polls WHERE id=?", (ids[1],)).fetchone()[0] == 1
+    assert client.get(body["polls"][1]["creator_link"]).status_code == 200
+
+
+def test_bulk_is_all_or_nothing(client, db_path):
+    create_poll(client)
+    resp = client.post("/api/polls/bulk", json=[{"question": "A | B"}, {"question": "No options"}, {"question": 7}])
+    assert resp.status_code == 400
+    assert [error["index"] for error in resp.get_json()["errors"]] == [1, 2]
+    assert poll_count(db_path) == 1
+
+
+def test_insert_polls_rolls_back_on_failure(client, db_path):
+    create_poll(client)
+    with pollapp.app.app_context():
+        with pytest.raises(sqlite3.IntegrityError):
+            # The second poll's option violates options.text NOT NULL after both polls were inserted.
+            pollapp.insert_polls(pollapp.get_db(), [("Q1", ["a", "b"], 0), ("Q2", ["c", None], 0)], "key")
+    assert poll_count(db_path) == 1
+
+
+def test_bulk_creator_key_must_own_polls(client):
+    first = client.post("/api/polls/bulk", json={"polls": [{"question": "A | B"}]}).get_json()
+    resp = client.post("/api/polls/bulk", json={"polls": [{"question": "C | D"}], "creator_key": first["creator_key"]})
+    assert resp.status_code == 201
+    assert resp.get_json()["portfolio_link"] == first["portfolio_link"]
+    resp = client.post("/api/polls/bulk", json={"polls": [{"question": "C | D"}], "creator_key": str(uuid.uuid4())})
+    assert resp.status_code == 400
+
+
+def test_import_polls_reports_bad_lines(client, db_path, tmp_path):
+    create_poll(client)
+    path = tmp_path / "polls.jsonl"
+    path.write_text('{"question": "A | B"}\n{not json\n\n{"question": "Only one"}\n')
+    result = pollapp.app.test_cli_runner().invoke(args=["import-polls", str(path)])
+    assert result.exit_code == 1
+    assert "line 2: invalid JSON" in result.output
+    assert "line 4: Provide 2 to 4 options." in result.output
+    assert poll_count(db_path) == 1
+
+
+def test_import_polls_prints_links(client, db_path, tmp_path):
+    path = tmp_path / "polls.jsonl"
+    path.write_text('{"question": "A | B"}\n{"question": "C or D"}\n')
+    runner = pollapp.app.test_cli_runner()
+    result = runner.invoke(args=["import-polls", str(path), "--base-url", "https://polls.example"])
+    assert result.exit_code == 0, result.output
+    links = [json.loads(line) for line in result.stdout.splitlines()]
+    assert [link["id"] for link in links] == [1, 2]
+    assert links[0]["poll_link"] == "https://polls.example/poll/1"
+
+    result = runner.invoke(args=["import-polls", str(path), "--creator-key", str(uuid.uuid4())])
+    assert result.exit_code != 0
+    assert poll_count(db_path) == 2
@@ -0,0 +1,63 @@
+from expiry import TimerWheel
+
+
+def test_fires_at_deadline_tick():
+    wheel = TimerWheel(tick=1, slots=8)
+    wheel.schedule("a", 100)
+    wheel.schedule("b", 104.5)
+    assert wheel.advance(99) == []
+    assert wheel.advance(100) == ["a"]
+    assert wheel.advance(104) == []
+    assert wheel.advance(105) == ["b"]
+    assert len(wheel) == 0
+
+
+def test_deadline_turns_away_waits_for_its_own_tick():
+    # 124 shares a bucket with 100, 108 and 116 on an 8-slot ring.
+    wheel = TimerWheel(tick=1, slots=8)
+    wheel.advance(99)
+    wheel.schedule("far", 124)
+    for now in range(100, 124):
+        assert wheel.advance(now) == [], now
+    assert "far" in wheel
+    assert wheel.advance(124) == ["far"]
+
+
+def test_jump_past_a_full_turn_fires_everything_due():
+    wheel = TimerWheel(tick=1, slots=8)
+    wheel.advance(99)
+    for key, when in (("a", 101), ("b", 103), ("c", 130), ("later", 500)):
+        wheel.schedule(key, when)
+    assert sorted(wheel.advance(200)) == ["a", "b", "c"]
+    assert "later" in wheel
+
+
+def test_first_advance_sweeps_deadlines_already_past():
+    # Polls that expired while the process was down close on the first tick.
+    wheel = TimerWheel(tick=1, slots=8)
+    wheel.schedule("old", 50)
+    wheel.schedule("older", 13)
+    wheel.schedule("open", 1000)
+    assert sorted(wheel.advance(100)) == ["old", "older"]
+    assert "open" in wheel and len(wheel) == 1
+
+
+def test_past_deadline_after_start_fires_on_next_advance():
+    wheel = TimerWheel(tick=1, slots=8)
+    wheel.advance(200)
+    wheel.schedule("late", 10)
+    assert wheel.advance(200) == []
+    assert wheel.advance(201) == ["late"]
+
+
+def test_reschedule_and_cancel():
+    wheel = TimerWheel(tick=1, slots=8)
+    wheel.advance(0)
+    wheel.schedule("a", 3)
+    wheel.schedule("a", 6)
+    wheel.schedule("b", 3)
+    wheel.cancel("b")
+    wheel.cancel("missing")
+    assert wheel.advance(5) == []
+    assert wheel.advance(6) == ["a"]
+
@@ -0,0 +1,65 @@
+import csv
+import io
+import json
+
+import pytest
+
+import app as pollapp
+from conftest import create_poll
+
+
+@pytest.fixture
+def poll(client):
+    """A poll with one vote per minute from 10:00 to 10:09 UTC on 2026-01-01."""
+    poll_id, secret = create_poll(client)
+    with pollapp.app.app_context():
+        options = [row[0] for row in pollapp.get_db().execute(
+            "SELECT id FROM options WHERE poll_id=? ORDER BY id", (poll_id,))]
+        vote_db = pollapp.get_vote_db(poll_id)
+        vote_db.executemany("INSERT INTO votes (poll_id, option_id, device_hash, created_at) VALUES (?, ?, ?, ?)",
+                            [(poll_id, options[i % 3], f"d{i}", f"2026-01-01 10:{i:02d}:00") for i in range(10)])
+        vote_db.commit()
+    return f"/creator/{poll_id}/{secret}/export"
+
+
+def exported_times(client, url):
+    resp = client.get(url)
+    assert resp.status_code == 200, resp.data
+    rows = list(csv.DictReader(io.StringIO(resp.get_data(as_text=True))))
+    return [row["created_at"][11:16] for row in rows]
+
+
+def test_csv_has_every_vote(client, poll):
+    resp = client.get(poll)
+    assert resp.mimetype == "text/csv"
+    header = resp.get_data(as_text=True).splitlines()[0]
+    assert header == ",".join(pollapp.EXPORT_COLUMNS)
+    assert len(exported_times(client, poll)) == 10
+
+
+def test_since_is_inclusive_and_until_exclusive(client, poll):
+    assert exported_times(client, f"{poll}?since=2026-01-01T10:03:00&until=2026-01-01T10:06:00") == \
+        ["10:03", "10:04", "10:05"]
+    assert exported_times(client, f"{poll}?since=2026-01-01T10:08") == ["10:08", "10:09"]
+    assert exported_times(client, f"{poll}?until=2026-01-01") == []
+
+
+def test_offsets_are_converted_to_utc(client, poll):
+    # 12:03+02:00 is 10:03 UTC; "+" must be percent-encoded in a query string.
+    assert exported_times(client, f"{poll}?since=2026-01-01T12:03:00%2B02:00&until=2026-01-01T05:05:00-05:00") == \
+        ["10:03", "10:04"]
+    assert exported_times(client, f"{poll}?since=2026-01-01T10:08:00Z") == ["10:08", "10:09"]
+
+
+def test_ndjson(client, poll):
+    resp = client.get(f"{poll}?format=ndjson&since=2026-01-01T10:09:00")
+    assert resp.mimetype == "application/x-ndjson"
+    rows = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+    assert [set(row) for row in rows] == [set(pollapp.EXPORT_COLUMNS)]
+    assert rows[0]["device_hash"] == "d9"
+
+
+def test_bad_requests(client, poll):
+    assert client.get(f"{poll}?since=yesterday").status_code == 400
+    assert client.get(f"{poll}?format=xml").status_code == 400
+    assert client.get(poll.replace("/export", "x/export")).status_code == 403
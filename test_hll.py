@@ -0,0 +1,76 @@
+import sqlite3
+
+import hll
+from hll import HyperLogLog
+
+
+def sketch_of(n, prefix="device"):
+    sketch = HyperLogLog()
+    for i in range(n):
+        sketch.add(f"{prefix}-{i}")
+    return sketch
+
+
+def test_small_sketch_round_trips_sparse():
+    sketch = sketch_of(40)
+    data = sketch.to_bytes()
+    assert data[:1] == b"S"
+    assert len(data) < hll.M
+    assert HyperLogLog.from_bytes(data).registers == sketch.registers
+
+
+def test_large_sketch_round_trips_dense():
+    sketch = sketch_of(20000)
+    data = sketch.to_bytes()
+    assert data[:1] == b"D"
+    assert len(data) == hll.M + 1
+    assert HyperLogLog.from_bytes(data).registers == sketch.registers
+
+
+def test_add_reports_changes_and_ignores_repeats():
+    sketch = HyperLogLog()
+    assert sketch.add("a")
+    assert not sketch.add("a")
+    assert sketch.count() == 1
+
+
+def test_estimates_stay_within_range():
+    # 1.04 / sqrt(2**11) is about 2.3%; allow three standard errors.
+    for n in (10, 100, 1000, 10000, 100000):
+        estimate = sketch_of(n).count()
+        assert abs(estimate - n) <= max(1, 0.07 * n), (n, estimate)
+
+
+def make_vote_db():
+    db = sqlite3.connect(":memory:")
+    db.execute("CREATE TABLE votes (id INTEGER PRIMARY KEY, poll_id INTEGER, device_hash TEXT, ip TEXT)")
+    db.execute(hll.SCHEMA)
+    return db
+
+
+def test_record_and_estimate_track_votes():
+    db = make_vote_db()
+    for i in range(300):
+        db.execute("INSERT INTO votes (poll_id, device_hash, ip) VALUES (1, ?, ?)", (f"d{i}", f"10.0.0.{i % 30}"))
+        hll.record(db, 1, f"d{i}", f"10.0.0.{i % 30}")
+    devices, ips = hll.estimate(db, 1)
+    assert abs(devices - 300) <= 21
+    assert ips == 30
+
+
+def test_estimate_saves_a_sketch_built_from_votes():
+    db = make_vote_db()
+    db.executemany("INSERT INTO votes (poll_id, device_hash, ip) VALUES (1, ?, ?)",
+                   [(f"d{i}", "10.0.0.1") for i in range(50)])
+    assert hll.load(db, 1)[2] is False
+    devices = HyperLogLog()
+    for i in range(50):
+        devices.add(f"d{i}")
+    assert hll.estimate(db, 1)[1] == 1
+    assert hll.load(db, 1)[2] is True
+    # From now on the stored sketch is read and updated; the votes are not rescanned.
+    db.execute("DELETE FROM votes")
+    hll.record(db, 1, "d-new", "10.0.0.2")
+    devices.add("d-new")
+    assert hll.estimate(db, 1) == (devices.count(), 2)
+
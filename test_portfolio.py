@@ -0,0 +1,85 @@
+import re
+import uuid
+
+import app as pollapp
+import tally
+from conftest import create_poll
+
+
+def test_guessable_cookie_key_is_replaced(client):
+    client.set_cookie("creator_key", "a")
+    create_poll(client)
+    key = client.get_cookie("creator_key").value
+    assert key != "a"
+    assert str(uuid.UUID(key)) == key
+    assert client.get("/creator/portfolio/a").status_code == 404
+    assert client.get(f"/creator/portfolio/{key}").status_code == 200
+
+
+def test_issued_cookie_key_is_kept(client):
+    create_poll(client)
+    key = client.get_cookie("creator_key").value
+    create_poll(client, "Cats | Dogs")
+    assert client.get_cookie("creator_key").value == key
+    assert b"Cats" in client.get(f"/creator/portfolio/{key}").data
+
+
+def test_bulk_rejects_made_up_keys(client):
+    for key in ("a", "test", "x" * 64, str(uuid.uuid4()).upper()):
+        resp = client.post("/api/polls/bulk", json={"polls": [{"question": "A | B"}], "creator_key": key})
+        assert resp.status_code == 400, key
+
+
+def page_ids(client, url):
+    """(poll ids listed, next page url) for one portfolio page."""
+    html = client.get(url).get_data(as_text=True)
+    ids = [int(poll_id) for poll_id in re.findall(r'href="/creator/(\d+)/[^"]+"', html)]
+    next_link = re.search(r'href="(/creator/portfolio/[^"]+before=\d+)"', html)
+    return ids, next_link and next_link.group(1).replace("&amp;", "&")
+
+
+def vote(client, poll_id, option_index, voter):
+    with pollapp.app.app_context():
+        option = pollapp.get_db().execute("SELECT id FROM options WHERE poll_id=? ORDER BY id LIMIT 1 OFFSET ?",
+                                          (poll_id, option_index)).fetchone()[0]
+    client.post(f"/poll/{poll_id}", data={"option": option}, headers={"User-Agent": voter})
+    client.delete_cookie("vote_token")
+
+
+def test_pages_walk_every_poll_once(client, monkeypatch):
+    monkeypatch.setattr(pollapp, "PORTFOLIO_PAGE_SIZE", 3)
+    # One bulk call: every poll gets the same created_at, so pages break ties on id.
+    body = client.post("/api/polls/bulk", json=[{"question": f"Q{i}: A | B | C"} for i in range(7)]).get_json()
+    key = body["creator_key"]
+    mine = [poll["id"] for poll in body["polls"]]
+    other = client.post("/api/polls/bulk", json=[{"question": "Not mine | Nope"}]).get_json()["polls"][0]["id"]
+
+    seen, url, pages = [], f"/creator/portfolio/{key}", 0
+    while url:
+        ids, url = page_ids(client, url)
+        seen += ids
+        pages += 1
+    assert pages == 3
+    assert seen == sorted(mine, reverse=True)
+
+    assert page_ids(client, f"/creator/portfolio/{key}?before=99999") == ([], None)
+    assert page_ids(client, f"/creator/portfolio/{key}?before={other}") == ([], None)
+
+
+def test_batched_totals_match_poll_results(client):
+    body = client.post("/api/polls/bulk", json=[{"question": f"Q{i}: A | B | C"} for i in range(4)]).get_json()
+    ids = [poll["id"] for poll in body["polls"]]
+    for n in range(12):
+        vote(client, ids[n % 3], n % 3, f"voter-{n}")
+    with pollapp.app.app_context():
+        db = pollapp.get_db()
+        tally.checkpoint(db, db, ids[0])  # part of ids[0] from its checkpoint, the rest from the tail
+    vote(client, ids[0], 2, "late-voter")
+    with pollapp.app.app_context():
+        pollapp.close_poll(ids[1])  # served from final_results
+        rows = pollapp.get_db().execute("SELECT * FROM polls WHERE id IN (?, ?, ?, ?)", ids).fetchall()
+        batched = pollapp.poll_results_many(rows)
+        pollapp.frozen_results.clear()
+        assert batched == {poll_id: pollapp.poll_results(poll_id) for poll_id in ids}
+    assert batched[ids[0]][1] == 5
+    assert batched[ids[3]][1] == 0
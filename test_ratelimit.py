@@ -0,0 +1,73 @@
+import pytest
+
+from ratelimit import MemoryBuckets, VoteLimiter
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def test_burst_then_wait(clock):
+    buckets = MemoryBuckets(clock=clock)
+    rate, burst = 5 / 60, 5  # the default device limit, 5/60
+    for _ in range(5):
+        assert buckets.take("device:x", rate, burst) == 0
+    assert buckets.take("device:x", rate, burst) == 12  # one token refills in 12s
+    assert buckets.take("device:y", rate, burst) == 0
+
+
+def test_tokens_refill_over_time(clock):
+    buckets = MemoryBuckets(clock=clock)
+    for _ in range(5):
+        buckets.take("k", 1, 5)
+    assert buckets.take("k", 1, 5) == 1
+    clock.now += 2
+    assert buckets.take("k", 1, 5) == 0
+    assert buckets.take("k", 1, 5) == 0
+    assert buckets.take("k", 1, 5) == 1
+    # Refill stops at the burst size.
+    clock.now += 3600
+    for _ in range(5):
+        assert buckets.take("k", 1, 5) == 0
+    assert buckets.take("k", 1, 5) > 0
+
+
+def test_prune_drops_full_buckets_first(clock):
+    buckets = MemoryBuckets(max_keys=4, clock=clock)
+    buckets.take("idle-1", 1, 5)
+    buckets.take("idle-2", 1, 5)
+    clock.now += 10  # both have refilled
+    for _ in range(5):
+        buckets.take("busy-1", 1, 5)
+        buckets.take("busy-2", 1, 5)
+    buckets.take("new", 1, 5)
+    assert sorted(buckets._buckets) == ["busy-1", "busy-2", "new"]
+    # An empty bucket must not have been reset by the prune.
+    assert buckets.take("busy-1", 1, 5) > 0
+
+
+def test_prune_evicts_oldest_half_when_nothing_is_full(clock):
+    buckets = MemoryBuckets(max_keys=4, clock=clock)
+    for key in ("a", "b", "c", "d"):
+        for _ in range(5):
+            buckets.take(key, 0.001, 5)
+        clock.now += 1
+    buckets.take("e", 0.001, 5)
+    assert sorted(buckets._buckets) == ["c", "d", "e"]
+
+
+def test_limiter_is_off_unless_enabled(monkeypatch):
+    monkeypatch.delenv("VOTE_RATE_LIMIT", raising=False)
+    assert VoteLimiter.from_env() is None
+    monkeypatch.setenv("VOTE_RATE_LIMIT", "on")
+    limiter = VoteLimiter.from_env()
+    assert [scope for scope, _ in limiter.limits] == ["device", "ip", "poll"]
@@ -0,0 +1,64 @@
+import gzip
+import json
+
+import msgpack
+import pytest
+
+import app as pollapp
+from conftest import create_poll
+
+COMPACT = pollapp.COMPACT_MIMETYPE
+
+
+@pytest.mark.parametrize("requested, accept, expected", [
+    (None, None, "json"),
+    (None, "*/*", "json"),
+    (None, "application/json", "json"),
+    (None, COMPACT, "compact"),
+    (None, f"application/json;q=0.5, {COMPACT}", "compact"),
+    (None, "application/msgpack", "msgpack"),
+    (None, "application/x-msgpack", "msgpack"),
+    (None, "text/html", "json"),
+    ("compact", "application/msgpack", "compact"),  # ?format= wins over Accept
+    ("json", COMPACT, "json"),
+    ("msgpack", None, "msgpack"),
+    ("yaml", COMPACT, "compact"),  # unknown ?format= falls back to Accept
+])
+def test_negotiate_results_format(requested, accept, expected):
+    assert pollapp.negotiate_results_format(requested, accept) == expected
+
+
+def test_msgpack_falls_back_to_compact_without_the_package(monkeypatch):
+    monkeypatch.setattr(pollapp, "msgpack", None)
+    assert pollapp.negotiate_results_format("msgpack", None) == "compact"
+    assert pollapp.negotiate_results_format(None, "application/msgpack") == "compact"
+
+
+def test_formats_carry_the_same_counts(client, db_path):
+    poll_id, _ = create_poll(client)
+    with pollapp.app.app_context():
+        options = [row[0] for row in pollapp.get_db().execute(
+            "SELECT id FROM options WHERE poll_id=? ORDER BY id", (poll_id,))]
+    for i, option in enumerate([options[1], options[1], options[2]]):
+        client.post(f"/poll/{poll_id}", data={"option": option}, headers={"User-Agent": f"v{i}"})
+        client.delete_cookie("vote_token")
+
+    full = client.get(f"/api/results/{poll_id}")
+    assert full.mimetype == "application/json"
+    assert [r["count"] for r in full.get_json()["results"]] == [0, 2, 1]
+
+    compact = client.get(f"/api/results/{poll_id}", headers={"Accept": COMPACT})
+    assert compact.mimetype == COMPACT
+    assert "Accept" in compact.headers["Vary"]
+    assert json.loads(compact.data) == {"counts": [0, 2, 1], "total_votes": 3}
+
+    packed = client.get(f"/api/results/{poll_id}?format=msgpack")
+    assert packed.mimetype == "application/msgpack"
+    assert msgpack.unpackb(packed.data) == {"counts": [0, 2, 1], "total_votes": 3}
+
+
+def test_json_is_compressed_when_accepted(client):
+    poll_id, _ = create_poll(client)
+    resp = client.get(f"/api/results/{poll_id}", headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(resp.data))["total_votes"] == 0
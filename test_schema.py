@@ -0,0 +1,43 @@
+import sqlite3
+
+from conftest import create_poll
+
+
+def make_legacy_db(path):
+    """polls as the first release created it, with rows, before created_at and later columns."""
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE polls (id INTEGER PRIMARY KEY, question TEXT NOT NULL, expiry TEXT NOT NULL, "
+               "hide_results INTEGER DEFAULT 0)")
+    db.execute("CREATE TABLE options (id INTEGER PRIMARY KEY, poll_id INTEGER NOT NULL, text TEXT NOT NULL)")
+    db.execute("CREATE TABLE votes (id INTEGER PRIMARY KEY, poll_id INTEGER NOT NULL, option_id INTEGER NOT NULL, "
+               "vote_token TEXT, device_hash TEXT, ip TEXT, created_at TEXT DEFAULT (datetime('now')))")
+    db.execute("INSERT INTO polls VALUES (1, 'Old poll', '2099-01-01T00:00:00', 0)")
+    db.executemany("INSERT INTO options (poll_id, text) VALUES (1, ?)", [("Yes",), ("No",)])
+    db.execute("INSERT INTO votes (poll_id, option_id) VALUES (1, 1)")
+    db.commit()
+    db.close()
+
+
+def test_upgrades_legacy_schema_with_rows(db_path, client):
+    make_legacy_db(db_path)
+    resp = client.get("/api/results/1")
+    assert resp.status_code == 200
+    assert resp.get_json()["total_votes"] == 1
+
+    db = sqlite3.connect(db_path)
+    columns = {row[1] for row in db.execute("PRAGMA table_info(polls)")}
+    assert {"creator_secret", "created_at", "closed", "final_results", "creator_key"} <= columns
+    assert db.execute("SELECT created_at IS NOT NULL, creator_secret IS NOT NULL FROM polls").fetchone() == (1, 1)
+    indexes = {row[0] for row in db.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+    assert {"idx_polls_creator", "idx_polls_open_expiry"} <= indexes
+
+
+def test_new_polls_on_upgraded_db_get_created_at(db_path, client):
+    make_legacy_db(db_path)
+    poll_id, secret = create_poll(client)
+    assert client.get(f"/creator/{poll_id}/{secret}").status_code == 200
+    created_at = sqlite3.connect(db_path).execute("SELECT created_at FROM polls WHERE id=?", (poll_id,)).fetchone()[0]
+    assert created_at is not None
+    key = client.get_cookie("creator_key").value
+    assert client.get(f"/creator/portfolio/{key}").status_code == 200
+
@@ -0,0 +1,61 @@
+import sqlite3
+
+import pytest
+
+import app as pollapp
+from conftest import create_poll
+
+
+def vote(client, poll_id, db_path, n=1):
+    option = sqlite3.connect(db_path).execute("SELECT MIN(id) FROM options WHERE poll_id=?", (poll_id,)).fetchone()[0]
+    for i in range(n):
+        client.post(f"/poll/{poll_id}", data={"option": option}, headers={"User-Agent": f"voter-{i}"})
+        client.delete_cookie("vote_token")
+
+
+def restart(monkeypatch, shards):
+    """What a new process with VOTE_SHARDS=shards sees."""
+    monkeypatch.setattr(pollapp, "VOTE_SHARDS", shards)
+    monkeypatch.setattr(pollapp, "_schema_ready", False)
+
+
+def test_changing_shard_count_is_refused(client, db_path, monkeypatch):
+    restart(monkeypatch, 2)
+    poll_id, _ = create_poll(client)
+    vote(client, poll_id, db_path, 3)
+    restart(monkeypatch, 4)
+    with pytest.raises(RuntimeError, match="cannot change"):
+        pollapp.init_db()
+    restart(monkeypatch, 2)
+    assert client.get(f"/api/results/{poll_id}").get_json()["total_votes"] == 3
+
+
+def test_sharding_needs_shard_votes_first(client, db_path, monkeypatch):
+    poll_id, _ = create_poll(client)
+    vote(client, poll_id, db_path, 3)
+    restart(monkeypatch, 2)
+    with pytest.raises(RuntimeError, match="shard-votes"):
+        pollapp.init_db()
+    result = pollapp.app.test_cli_runner().invoke(args=["shard-votes"])
+    assert result.exit_code == 0, result.output
+    assert "Moved 3 votes" in result.output
+    restart(monkeypatch, 2)
+    assert client.get(f"/api/results/{poll_id}").get_json()["total_votes"] == 3
+
+
+def test_shard_votes_rerun_after_crash_does_not_duplicate(client, db_path, monkeypatch):
+    poll_id, _ = create_poll(client)
+    vote(client, poll_id, db_path, 3)
+    main = sqlite3.connect(db_path)
+    votes = main.execute("SELECT * FROM votes").fetchall()
+    restart(monkeypatch, 2)
+    runner = pollapp.app.test_cli_runner()
+    assert runner.invoke(args=["shard-votes"]).exit_code == 0
+    # A crash after the shard commit but before the main database's delete.
+    main.executemany(f"INSERT INTO votes VALUES ({','.join('?' * len(votes[0]))})", votes)
+    main.commit()
+    result = runner.invoke(args=["shard-votes"])
+    assert "Moved 0 votes" in result.output
+    assert main.execute("SELECT COUNT(*) FROM votes").fetchone()[0] == 0
+    restart(monkeypatch, 2)
+    assert client.get(f"/api/results/{poll_id}").get_json()["total_votes"] == 3
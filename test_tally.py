@@ -0,0 +1,93 @@
+import datetime
+import sqlite3
+
+import tally
+from tally import TallyEngine
+
+
+def make_db(polls=1, options=3, hours=1):
+    """One connection holding polls, options and votes, like an unsharded poll.db."""
+    db = sqlite3.connect(":memory:")
+    db.execute("CREATE TABLE polls (id INTEGER PRIMARY KEY, expiry TEXT NOT NULL)")
+    db.execute("CREATE TABLE options (id INTEGER PRIMARY KEY, poll_id INTEGER, text TEXT)")
+    db.execute("CREATE TABLE votes (id INTEGER PRIMARY KEY, poll_id INTEGER, option_id INTEGER)")
+    db.execute(tally.SCHEMA)
+    expiry = (datetime.datetime.now() + datetime.timedelta(hours=hours)).isoformat()
+    for poll_id in range(1, polls + 1):
+        db.execute("INSERT INTO polls (id, expiry) VALUES (?, ?)", (poll_id, expiry))
+        db.executemany("INSERT INTO options (poll_id, text) VALUES (?, ?)",
+                       [(poll_id, f"option {i}") for i in range(options)])
+    db.commit()
+    return db
+
+
+def vote(db, poll_id, option_id):
+    vote_id = db.execute("INSERT INTO votes (poll_id, option_id) VALUES (?, ?)", (poll_id, option_id)).lastrowid
+    db.commit()
+    return vote_id
+
+
+def true_counts(db, poll_id):
+    return dict(db.execute("SELECT option_id, COUNT(*) FROM votes WHERE poll_id=? GROUP BY option_id", (poll_id,)))
+
+
+def test_checkpoint_plus_tail_matches_the_votes():
+    db = make_db()
+    for i in range(10):
+        vote(db, 1, 1 + i % 3)
+    tally.checkpoint(db, db, 1)
+    assert tally.read_checkpoint(db, 1) == ({1: 4, 2: 3, 3: 3}, 10)
+    for i in range(5):
+        vote(db, 1, 1)
+    assert tally.read_checkpoint(db, 1)[0] == {1: 4, 2: 3, 3: 3}
+    assert tally.load_counts(db, [1]) == {1: true_counts(db, 1)}
+    tally.checkpoint(db, db, 1)
+    assert tally.read_checkpoint(db, 1) == ({1: 9, 2: 3, 3: 3}, 15)
+
+
+def test_restart_recovers_from_checkpoint_and_tail():
+    db = make_db()
+    engine = TallyEngine()
+    for i in range(20):
+        engine.record_vote(db, db, 1, 1 + i % 3, vote(db, 1, 1 + i % 3))
+    engine.checkpoint_all(db, lambda poll_id: db)
+    # Votes after the last checkpoint, then a crash: a new engine must see them all.
+    for _ in range(4):
+        engine.record_vote(db, db, 1, 2, vote(db, 1, 2))
+    before = engine.results(db, db, 1)
+    recovered = TallyEngine().results(db, db, 1)
+    assert recovered == before
+    assert recovered[1] == 24
+    assert {oid: count for _, count, oid, _ in recovered[0]} == true_counts(db, 1)
+
+
+def test_watermark_skips_votes_already_loaded():
+    db = make_db()
+    engine = TallyEngine()
+    # Committed before the poll was loaded: the load counts it, so
+    # record_vote must not count it again.
+    early = vote(db, 1, 1)
+    assert engine.record_vote(db, db, 1, 1, early) == 1
+    assert engine.record_vote(db, db, 1, 1, early) == 1
+    assert engine.record_vote(db, db, 1, 2, vote(db, 1, 2)) == 2
+    assert engine.results(db, db, 1)[0][0][1] == 1
+
+
+def test_load_counts_batches_several_polls():
+    db = make_db(polls=3, options=2)
+    vote(db, 1, 1)
+    vote(db, 2, 3)
+    tally.checkpoint(db, db, 2)
+    vote(db, 2, 4)
+    assert tally.load_counts(db, [1, 2, 3]) == {1: {1: 1}, 2: {3: 1, 4: 1}, 3: {}}
+    assert tally.load_counts(db, []) == {}
+
+
+def test_checkpoint_all_evicts_expired_polls():
+    db = make_db(hours=-1)
+    engine = TallyEngine()
+    engine.record_vote(db, db, 1, 1, vote(db, 1, 1))
+    assert engine.checkpoint_all(db, lambda poll_id: db) == 1
+    assert engine.checkpoint_all(db, lambda poll_id: db) == 0
+    assert tally.read_checkpoint(db, 1)[0] == {1: 1, 2: 0, 3: 0}
+